@@ -29,6 +29,7 @@ setup(
     package_data={'skew': ['_version']},
     package_dir={'skew': 'skew'},
     install_requires=requires,
+    extras_require={'numpy': ['numpy']},
     license='Apache License 2.0',
     classifiers=[
         'Development Status :: 4 - Beta',
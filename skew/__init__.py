@@ -11,12 +11,41 @@
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
 
+import importlib
 import os
-
-from skew.arn import ARN
+import sys
 
 __version__ = open(os.path.join(os.path.dirname(__file__), '_version')).read()
 
+# The rest of the public API, imported only when it is first used so
+# that ``import skew`` stays cheap for short-lived processes.  boto3,
+# botocore, jmespath, yaml and the resource modules are in turn only
+# imported once a scan needs them.
+_LazyNames = {
+    'ARN': 'skew.arn',
+    'AsyncScan': 'skew.aio',
+    'hydrate': 'skew.resources.aws',
+}
+
+
+def __getattr__(name):
+    if name not in _LazyNames:
+        raise AttributeError("module 'skew' has no attribute '%s'" % name)
+    value = getattr(importlib.import_module(_LazyNames[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LazyNames))
+
+
+# Module __getattr__ needs Python 3.7, older versions import them now.
+if sys.version_info < (3, 7):
+    from skew.aio import AsyncScan  # noqa: F401
+    from skew.arn import ARN  # noqa: F401
+    from skew.resources.aws import hydrate  # noqa: F401
+
 
 def scan(sku, **kwargs):
     """
@@ -37,4 +66,25 @@ def scan(sku, **kwargs):
     but since there is currently only one (ARN) let's not over-complicate
     things.
     """
+    from skew.arn import ARN
     return ARN(sku, **kwargs)
+
+
+def ascan(sku, max_concurrency=32, load_tags=False, hydrate=False,
+          max_queued=1000, **kwargs):
+    """
+    The asyncio version of ``scan``.
+
+    Returns an asynchronous iterator over the resources matching the
+    SKU.  The AWS calls needed to find them are run concurrently, with
+    no more than ``max_concurrency`` in flight at once.  If ``load_tags``
+    is True the tags of each resource are fetched before it is returned
+    and if ``hydrate`` is True so are its details.  At most
+    ``max_queued`` resources wait to be returned at a time.  Any other
+    keyword arguments are handled just as they are by ``scan``.
+    """
+    from skew.aio import AsyncScan
+    from skew.arn import ARN
+    return AsyncScan(ARN(sku, **kwargs), max_concurrency=max_concurrency,
+                     load_tags=load_tags, hydrate=hydrate,
+                     max_queued=max_queued)
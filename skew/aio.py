@@ -0,0 +1,157 @@
+# Copyright 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import skew.resources.aws
+import skew.snapshot
+
+LOG = logging.getLogger(__name__)
+
+_DONE = object()
+
+# get_running_loop is new in Python 3.7.
+_running_loop = getattr(asyncio, 'get_running_loop', asyncio.get_event_loop)
+
+
+class _Failure(object):
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+class AsyncScan(object):
+    """
+    An asynchronous iterator over the resources matched by an ``ARN``.
+
+    boto3 is not asyncio-aware so every AWS call is still made on a
+    thread, but the calls are scheduled from the event loop rather than
+    from a single blocking scan.  Each work unit of the ARN becomes a
+    separate call, and so does each fetch of the details of a resource
+    it returns (its ``detail_spec`` and ``attr_spec``) if ``hydrate``
+    is True and each batch of tag lookups if ``load_tags`` is True.  At
+    most ``max_concurrency`` calls are in flight at any time.  Resources
+    are returned as soon as the unit that found them completes::
+
+        async for resource in skew.ascan('arn:aws:ec2:*:*:instance/*'):
+            print(resource.arn)
+
+    If the ARN was given a ``since`` snapshot the scan is incremental,
+    just like iterating over the ARN: ``ResourceChange`` objects are
+    returned instead of resources and the new snapshot is left in
+    ``snapshot`` once the scan is done.
+
+    No more than ``max_queued`` resources are held waiting to be
+    returned, beyond that the scan waits for the consumer to catch up.
+    """
+
+    def __init__(self, arn, max_concurrency=32, load_tags=False,
+                 hydrate=False, max_queued=1000):
+        self._arn = arn
+        self.max_concurrency = max_concurrency
+        self.load_tags = load_tags
+        self.hydrate = hydrate
+        self.max_queued = max_queued
+        self._queue = None
+        self._task = None
+        self._semaphore = None
+        self._executor = None
+        self._tracker = None
+
+    @property
+    def snapshot(self):
+        return self._arn.snapshot
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._queue is None:
+            self._start()
+        item = await self._queue.get()
+        if item is _DONE:
+            raise StopAsyncIteration
+        if isinstance(item, _Failure):
+            raise item.exception
+        return item
+
+    async def aclose(self):
+        """
+        Stop the scan.  Calls that are already running on a thread are
+        allowed to finish but their results are discarded.
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def _start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        self._task = asyncio.ensure_future(self._run())
+
+    async def _call(self, fn, *args):
+        async with self._semaphore:
+            loop = _running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _enumerate_unit(self, unit):
+        return list(self._arn._enumerate_unit(unit))
+
+    async def _run_unit(self, unit):
+        LOG.debug('AsyncScan unit %s', str(unit))
+        resources = await self._call(self._enumerate_unit, unit)
+        calls = []
+        if self.hydrate:
+            for resource in resources:
+                if isinstance(resource, skew.resources.aws.AWSResource):
+                    calls.extend(self._call(resource._hydrate, name)
+                                 for name in resource._hydration_names())
+        if self.load_tags:
+            calls.extend(
+                self._call(skew.resources.aws.load_tags, batch)
+                for batch in skew.resources.aws.tag_batches(resources))
+        await asyncio.gather(*calls)
+        for resource in resources:
+            if self._tracker is not None:
+                resource = self._tracker.record(resource)
+            await self._queue.put(resource)
+
+    async def _run(self):
+        self._arn.reset_memo()
+        if self._arn.since is not None:
+            self._tracker = skew.snapshot.SnapshotTracker(self._arn.since)
+            self._arn.snapshot_tracker = self._tracker
+        try:
+            # Expanding the ARN can call DescribeRegions.
+            units = await self._call(list, self._arn.work_units())
+            await asyncio.gather(*[self._run_unit(u) for u in units])
+            if self._tracker is not None:
+                for change in self._tracker.removed():
+                    await self._queue.put(change)
+                self._arn.snapshot = self._tracker.snapshot
+            await self._queue.put(_DONE)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            LOG.debug(e)
+            await self._queue.put(_Failure(e))
+        finally:
+            self._arn.snapshot_tracker = None
+            self._executor.shutdown(wait=False)
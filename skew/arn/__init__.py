@@ -15,16 +15,93 @@
 
 import logging
 import re
+import threading
+from collections import namedtuple
 
-from six.moves import zip_longest
-import jmespath
+try:
+    from itertools import zip_longest
+except ImportError:
+    from itertools import izip_longest as zip_longest
 
+import skew.plan
+import skew.query
+import skew.regions
 import skew.resources
+import skew.snapshot
 from skew.config import get_config
 
 LOG = logging.getLogger(__name__)
 DebugFmtString = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
+# A single, independent piece of a scan: one resource type in one
+# region of one account.
+WorkUnit = namedtuple('WorkUnit', ['scheme', 'provider', 'service', 'region',
+                                   'account', 'resource_type'])
+
+
+# Characters that make a pattern a regular expression rather than a
+# literal value or a simple ``*`` glob.
+RegexChars = frozenset('.^$+?{}[]\\|()')
+
+
+class Matcher(object):
+    """
+    A component pattern, compiled once.  A pattern always has to match
+    the whole of a value:
+
+    * ``*``, ``.*`` or an empty pattern match anything
+    * a pattern with no special characters only matches itself
+    * a pattern whose only special character is a single trailing ``*``
+      is a prefix, e.g. ``us-*`` matches every value starting with
+      ``us-``
+    * anything else is a regular expression, e.g. ``us-(east|west)-.*``,
+      unless it isn't a valid one (e.g. ``*-1``) in which case each
+      ``*`` matches anything
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.regex = None
+        if pattern in (None, '', '*', '.*'):
+            self.kind = 'any'
+        elif RegexChars.intersection(pattern):
+            self.kind = 'regex'
+            self.regex = re.compile(pattern)
+        elif '*' not in pattern:
+            self.kind = 'literal'
+        elif pattern.endswith('*') and pattern.count('*') == 1:
+            self.kind = 'prefix'
+            self.prefix = pattern[:-1]
+        else:
+            self.kind = 'regex'
+            try:
+                self.regex = re.compile(pattern)
+            except re.error:
+                self.regex = re.compile(
+                    '.*'.join(re.escape(p) for p in pattern.split('*')))
+
+    def __repr__(self):
+        return 'Matcher(%r, %s)' % (self.pattern, self.kind)
+
+    def match(self, value):
+        if self.kind == 'any':
+            return True
+        if self.kind == 'literal':
+            return value == self.pattern
+        if self.kind == 'prefix':
+            return value.startswith(self.prefix)
+        return self.regex.fullmatch(value) is not None
+
+    def filter(self, choices):
+        """
+        Return the ``choices`` that match, in their original order.
+        """
+        if self.kind == 'any':
+            return list(choices)
+        if self.kind == 'literal':
+            return [self.pattern] if self.pattern in choices else []
+        return [c for c in choices if self.match(c)]
+
 
 class ARNComponent(object):
 
@@ -35,6 +112,18 @@ class ARNComponent(object):
     def __repr__(self):
         return self.pattern
 
+    @property
+    def pattern(self):
+        return self._pattern
+
+    @pattern.setter
+    def pattern(self, pattern):
+        self._pattern = pattern
+        self._matcher = self._compile(pattern)
+
+    def _compile(self, pattern):
+        return Matcher(pattern)
+
     def choices(self, context=None):
         """
         This method is responsible for returning all of the possible
@@ -53,29 +142,25 @@ class ARNComponent(object):
     def match(self, pattern, context=None):
         """
         This method returns a (possibly empty) list of strings that
-        match the regular expression ``pattern`` provided.  You can
+        match the ``pattern`` provided (see ``Matcher``).  You can
         also provide a ``context`` as described above.
 
         This method calls ``choices`` to get a list of all possible
-        choices and then filters the list by performing a regular
-        expression search on each choice using the supplied ``pattern``.
+        choices and then filters the list using the supplied
+        ``pattern``.
         """
-        matches = []
-        regex = pattern
-        if regex == '*':
-            regex = '.*'
-        regex = re.compile(regex)
-        for choice in self.choices(context):
-            if regex.search(choice):
-                matches.append(choice)
-        return matches
+        if pattern == self._pattern:
+            matcher = self._matcher
+        else:
+            matcher = self._compile(pattern)
+        return matcher.filter(self.choices(context))
 
     def matches(self, context=None):
         """
         This is a convenience method to return all possible matches
         filtered by the current value of the ``pattern`` attribute.
         """
-        return self.match(self.pattern, context)
+        return self._matcher.filter(self.choices(context))
 
     def complete(self, prefix='', context=None):
         return [c for c in self.choices(context) if c.startswith(prefix)]
@@ -99,9 +184,9 @@ class Resource(ARNComponent):
             resource_id = resource
         return (resource_type, resource_id)
 
-    def match(self, pattern, context=None):
+    def _compile(self, pattern):
         resource_type, _ = self._split_resource(pattern)
-        return super(Resource, self).match(resource_type, context)
+        return Matcher(resource_type)
 
     def choices(self, context=None):
         if context:
@@ -116,17 +201,25 @@ class Resource(ARNComponent):
 
     def enumerate(self, context, **kwargs):
         LOG.debug('Resource.enumerate %s', context)
+        for resource_type in self.matches(context):
+            for resource in self.enumerate_type(
+                    context, resource_type, **kwargs):
+                yield resource
+
+    def enumerate_type(self, context, resource_type, **kwargs):
+        """
+        Enumerate a single, already matched, ``resource_type`` within
+        the scheme, provider, service, region and account given by
+        ``context``.
+        """
         _, provider, service_name, region, account = context
-        resource_type, resource_id = self._split_resource(self.pattern)
+        _, resource_id = self._split_resource(self.pattern)
         LOG.debug('resource_type=%s, resource_id=%s',
                   resource_type, resource_id)
-        resources = []
-        for resource_type in self.matches(context):
-            resource_path = '.'.join([provider, service_name, resource_type])
-            resource_cls = skew.resources.find_resource_class(resource_path)
-            resources.extend(resource_cls.enumerate(
-                self._arn, region, account, resource_id, **kwargs))
-        return resources
+        resource_path = '.'.join([provider, service_name, resource_type])
+        resource_cls = skew.resources.find_resource_class(resource_path)
+        return resource_cls.enumerate(
+            self._arn, region, account, resource_id, **kwargs)
 
 
 class Account(ARNComponent):
@@ -136,7 +229,34 @@ class Account(ARNComponent):
         super(Account, self).__init__(pattern, arn)
 
     def choices(self, context=None):
-        return list(self._accounts.keys())
+        return self._enabled(list(self._accounts.keys()), context)
+
+    def matches(self, context=None):
+        # Only the accounts that match need their regions checked.
+        return self._enabled(
+            self._matcher.filter(list(self._accounts.keys())), context)
+
+    def _enabled(self, accounts, context):
+        if not (context and len(context) > 3 and context[3]):
+            return accounts
+        # By default only regions matched by a pattern are checked, a
+        # region named outright is scanned as asked.
+        enabled_only = getattr(self._arn, 'enabled_regions_only', None)
+        if enabled_only is None:
+            enabled_only = self._arn.region._matcher.kind != 'literal'
+        if not enabled_only:
+            return accounts
+        # Leave out accounts that don't have this region enabled
+        region = context[3]
+        choices = []
+        for account in accounts:
+            regions = skew.regions.enabled_regions(
+                account, **self._arn.kwargs)
+            if regions is None or region in regions:
+                choices.append(account)
+            else:
+                LOG.debug('%s is not enabled in %s', region, account)
+        return choices
 
     def enumerate(self, context, **kwargs):
         LOG.debug('Account.enumerate %s', context)
@@ -149,6 +269,9 @@ class Account(ARNComponent):
 
 
 class Region(ARNComponent):
+
+    # Only used for services botocore has no endpoint data for.  The
+    # regions for everything else come from skew.regions.
     _all_region_names = ['us-east-1',
                          'us-east-2',
                          'us-west-1',
@@ -165,19 +288,14 @@ class Region(ARNComponent):
                          'ap-northeast-2',
                          'ap-south-1',
                          'ap-east-1',
-                         'af-south-1'
+                         'af-south-1',
                          'ca-central-1',
                          'sa-east-1',
-                         'me-south-1',
-                         'cn-north-1',
-                         'cn-northwest-1']
+                         'me-south-1']
 
     _no_region_required = ['']
 
     _service_region_map = {
-        'redshift': _all_region_names,
-        'glacier': ['ap-northeast-1', 'ap-northeast-2', 'ap-south-1', 'ap-southeast-2', 'ca-central-1', 'eu-central-1',
-                    'eu-west-1', 'eu-west-2', 'us-east-1', 'us-east-2', 'us-west-1', 'us-west-2'],
         'cloudfront': _no_region_required,
         'iam': _no_region_required,
         'route53': _no_region_required
@@ -185,11 +303,15 @@ class Region(ARNComponent):
 
     def choices(self, context=None):
         if context:
-            service = context[2]
+            provider, service = context[1:3]
         else:
-            service = self._arn.service
-        return self._service_region_map.get(
-            service, self._all_region_names)
+            provider = self._arn.provider.pattern
+            service = self._arn.service.pattern
+        if service in self._service_region_map:
+            return self._service_region_map[service]
+        partition = skew.regions.partition_for_provider(provider)
+        regions = skew.regions.service_regions(service, partition)
+        return regions or self._all_region_names
 
     def enumerate(self, context, **kwargs):
         LOG.debug('Region.enumerate %s', context)
@@ -258,7 +380,22 @@ class ARN(object):
         self.query = None
         self._components = None
         self._build_components_from_string(arn_string)
+        # Options that control how the scan is executed rather than how
+        # the clients are created never get passed down to the resources.
+        self.max_workers = kwargs.pop('max_workers', None)
+        self.max_per_service = kwargs.pop('max_per_service', None)
+        self.max_per_account = kwargs.pop('max_per_account', None)
+        self.since = kwargs.pop('since', None)
+        self.enabled_regions_only = kwargs.pop('enabled_regions_only', None)
+        self.tags = kwargs.pop('tags', None)
+        self.load_tags = kwargs.pop('load_tags', False)
+        self.iam_bulk = kwargs.pop('iam_bulk', False)
+        self.lazy_stack_resources = kwargs.pop('lazy_stack_resources', False)
+        self.snapshot = None
+        self.snapshot_tracker = None
         self.kwargs = kwargs
+        self._memo = {}
+        self._memo_lock = threading.Lock()
 
     def __repr__(self):
         return ':'.join([str(c) for c in self._components])
@@ -289,7 +426,7 @@ class ARN(object):
     def _build_components_from_string(self, arn_string):
         if '|' in arn_string:
             arn_string, query = arn_string.split('|')
-            self.query = jmespath.compile(query)
+            self.query = skew.query.compile_query(query)
         pairs = zip_longest(
             self.ComponentClasses, arn_string.split(':', 5), fillvalue='*')
         self._components = [c(n, self) for c, n in pairs]
@@ -318,7 +455,136 @@ class ARN(object):
     def resource(self):
         return self._components[5]
 
+    def memo(self, key, fn):
+        """
+        Return the result of calling ``fn``, calling it only the first
+        time ``key`` is asked for during the life of this ARN.  This is
+        how lookups shared by many resource types (or many resources)
+        are done once per scan, even when the scan is parallel.
+        """
+        with self._memo_lock:
+            entry = self._memo.get(key)
+            if entry is None:
+                entry = self._memo[key] = {'lock': threading.Lock()}
+        with entry['lock']:
+            if 'value' not in entry:
+                entry['value'] = fn()
+        return entry['value']
+
+    def reset_memo(self):
+        """
+        Forget the results of ``memo``.  This is done at the start of
+        each scan so iterating over an ARN again sees current data.
+        """
+        with self._memo_lock:
+            self._memo = {}
+
+    def work_units(self):
+        """
+        Expand the component tree into the list of independent
+        ``WorkUnit`` objects, one for each combination of service,
+        region, account and resource type matched by this ARN.  When
+        the region is a pattern, finding the regions each account has
+        enabled takes one ``DescribeRegions`` call per account (cached
+        for an hour, see ``enabled_regions_only``).  No other API calls
+        are made by this method.
+        """
+        context = []
+        for scheme in self.scheme.matches(context):
+            context.append(scheme)
+            for provider in self.provider.matches(context):
+                context.append(provider)
+                for service in self.service.matches(context):
+                    context.append(service)
+                    for region in self.region.matches(context):
+                        context.append(region)
+                        for account in self.account.matches(context):
+                            context.append(account)
+                            for resource_type in self.resource.matches(
+                                    context):
+                                yield WorkUnit(*(context + [resource_type]))
+                            context.pop()
+                        context.pop()
+                    context.pop()
+                context.pop()
+            context.pop()
+
+    def plan(self, max_units=None):
+        """
+        Return the ``ScanPlan`` of this ARN: the work units a scan would
+        run, each with the operation that lists its resources and an
+        estimate of the calls per resource needed for their details and
+        tags.  The only API calls made are the (cached) ones that find
+        the regions each account has enabled when the region is a
+        pattern, see ``enabled_regions_only``.  The plan can be saved,
+        sharded and run later.
+
+        :type max_units: int
+        :param max_units: If the ARN matches more work units than this
+            a ``ValueError`` is raised rather than planning a runaway
+            scan.
+        """
+        steps = []
+        for unit in self.work_units():
+            if max_units is not None and len(steps) >= max_units:
+                raise ValueError('%s matches more than %d work units'
+                                 % (self, max_units))
+            steps.append(skew.plan.plan_step(unit))
+        return skew.plan.ScanPlan(str(self), steps)
+
+    def _enumerate_unit(self, unit):
+        context = list(unit[:5])
+        return self.resource.enumerate_type(
+            context, unit.resource_type, **self.kwargs)
+
     def __iter__(self):
+        return self._scan()
+
+    def scan_units(self, units):
+        """
+        Scan only the given work units (e.g. one shard of a plan),
+        returning the same results as iterating over the ARN would for
+        them.
+        """
+        return self._scan(units)
+
+    def _scan(self, units=None):
+        self.reset_memo()
+        if self.since is None:
+            for resource in self._iter_resources(units):
+                yield resource
+            return
+        # An incremental scan yields ResourceChange objects rather than
+        # resources and leaves the new snapshot in self.snapshot.
+        tracker = skew.snapshot.SnapshotTracker(self.since)
+        self.snapshot_tracker = tracker
+        try:
+            for resource in self._iter_resources(units):
+                yield tracker.record(resource)
+            for change in tracker.removed():
+                yield change
+            self.snapshot = tracker.snapshot
+        finally:
+            self.snapshot_tracker = None
+
+    def _iter_resources(self, units=None):
+        if self.max_workers:
+            # The thread pool machinery is only imported when it's used.
+            import skew.executor
+            executor = skew.executor.ScanExecutor(
+                max_workers=self.max_workers,
+                max_per_service=self.max_per_service,
+                max_per_account=self.max_per_account)
+            if units is None:
+                units = self.work_units()
+            for resource in executor.run(units, self._enumerate_unit):
+                yield resource
+            return
+        if units is not None:
+            for unit in units:
+                for resource in self._enumerate_unit(unit):
+                    yield resource
+            return
         context = []
         for scheme in self.scheme.enumerate(context, **self.kwargs):
             yield scheme
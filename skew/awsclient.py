@@ -13,14 +13,16 @@
 # limitations under the License.
 
 import logging
-import time
+import threading
+from collections import OrderedDict
 
 import datetime
-import jmespath
 import boto3
 from botocore.exceptions import ClientError
 
 from skew.config import get_config
+import skew.query
+import skew.ratelimit
 
 LOG = logging.getLogger(__name__)
 
@@ -33,6 +35,100 @@ def json_encoder(obj):
         return obj
 
 
+class ClientPool(object):
+    """
+    A process-wide cache of boto3 sessions and botocore clients.
+
+    Creating a session and a client is expensive (the service model has
+    to be loaded and parsed each time) so rather than building new ones
+    for every ``AWSClient`` we keep them around and hand them out again.
+    Sessions are keyed by account and profile (or explicit credentials)
+    and clients are keyed by session, service and region.  Both caches
+    are bounded and the least recently used entry is evicted when they
+    fill up.  botocore clients are thread-safe but sessions are not so
+    all creation happens while holding the pool lock.
+    """
+
+    def __init__(self, max_clients=256, max_sessions=64):
+        self.max_clients = max_clients
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._clients = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _session_key(self, account_id, profile, aws_creds):
+        if aws_creds:
+            return (account_id, tuple(sorted(aws_creds.items())))
+        return (account_id, profile)
+
+    def _get_session(self, key, profile, aws_creds):
+        session = self._sessions.get(key)
+        if session is None:
+            if aws_creds:
+                session = boto3.Session(**aws_creds)
+            else:
+                session = boto3.Session(profile_name=profile)
+            self._sessions[key] = session
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(key)
+        return session
+
+    def get_client(self, service_name, region_name, account_id,
+                   profile=None, aws_creds=None):
+        session_key = self._session_key(account_id, profile, aws_creds)
+        key = (session_key, service_name, region_name)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.hits += 1
+                self._clients.move_to_end(key)
+                return client
+            self.misses += 1
+            session = self._get_session(session_key, profile, aws_creds)
+            client = session.client(service_name, region_name=region_name)
+            skew.ratelimit.get_rate_controller(
+                account_id, region_name, service_name).attach(client)
+            self._clients[key] = client
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+            return client
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'clients': len(self._clients),
+                    'sessions': len(self._sessions)}
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self._sessions.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+_client_pool = None
+_client_pool_lock = threading.Lock()
+
+
+def get_client_pool():
+    global _client_pool
+    if _client_pool is None:
+        with _client_pool_lock:
+            if _client_pool is None:
+                _client_pool = ClientPool()
+    return _client_pool
+
+
 class AWSClient(object):
 
     def __init__(self, service_name, region_name, account_id, **kwargs):
@@ -41,6 +137,7 @@ class AWSClient(object):
         self._region_name = region_name
         self._account_id = account_id
         self._has_credentials = False
+        self._profile = None
         self.aws_creds = kwargs.get('aws_creds')
         if self.aws_creds is None:
             self.aws_creds = self._config['accounts'][account_id].get(
@@ -51,6 +148,7 @@ class AWSClient(object):
         self.placebo = kwargs.get('placebo')
         self.placebo_dir = kwargs.get('placebo_dir')
         self.placebo_mode = kwargs.get('placebo_mode', 'record')
+        self.cache = kwargs.get('cache')
         self._client = self._create_client()
 
     @property
@@ -70,19 +168,74 @@ class AWSClient(object):
         return self._profile
 
     def _create_client(self):
+        region_name = self.region_name if self.region_name else None
+        if not (self.placebo and self.placebo_dir):
+            return get_client_pool().get_client(
+                self.service_name, region_name, self.account_id,
+                profile=self._profile,
+                aws_creds=self.aws_creds)
+        # Placebo attaches itself to a session so recording and playback
+        # always get a private session rather than a pooled one.
         if self.aws_creds:
             session = boto3.Session(**self.aws_creds)
         else:
             session = boto3.Session(
                 profile_name=self.profile)
-        if self.placebo and self.placebo_dir:
-            pill = self.placebo.attach(session, self.placebo_dir)
-            if self.placebo_mode == 'record':
-                pill.record()
-            elif self.placebo_mode == 'playback':
-                pill.playback()
-        return session.client(self.service_name,
-                              region_name=self.region_name if self.region_name else None)
+        pill = self.placebo.attach(session, self.placebo_dir)
+        if self.placebo_mode == 'record':
+            pill.record()
+        elif self.placebo_mode == 'playback':
+            pill.playback()
+        client = session.client(self.service_name, region_name=region_name)
+        skew.ratelimit.get_rate_controller(
+            self.account_id, region_name, self.service_name).attach(client)
+        return client
+
+    def _call(self, op_name, **kwargs):
+        # Returns the full response of the operation or None if a
+        # non-paginated request failed.
+        if self._client.can_paginate(op_name):
+            paginator = self._client.get_paginator(op_name)
+            results = paginator.paginate(**kwargs)
+            return results.build_full_result()
+        # Throttled requests are retried with backoff by the rate
+        # controller attached to the client so by the time an error
+        # gets here it is final.
+        op = getattr(self._client, op_name)
+        try:
+            return op(**kwargs)
+        except ClientError as e:
+            LOG.debug(e, kwargs)
+            if skew.ratelimit.is_throttle(
+                    (None, getattr(e, 'response', None))):
+                LOG.warning('%s.%s still throttled after retries',
+                            self.service_name, op_name)
+        except Exception:
+            pass
+        return None
+
+    def _iter_pages(self, op_name, **kwargs):
+        if self._client.can_paginate(op_name):
+            paginator = self._client.get_paginator(op_name)
+            for page in paginator.paginate(**kwargs):
+                yield page
+        else:
+            data = self._call(op_name, **kwargs)
+            if data is not None:
+                yield data
+
+    def _cache_key(self, op_name, params, kind='call'):
+        return self.cache.key(self.account_id, self.region_name,
+                              self.service_name, op_name, params, kind)
+
+    def _cache_pages(self, key, op_name, pages):
+        # Pass the pages straight through, only writing them to the
+        # cache once the last one has been seen.
+        seen = []
+        for page in pages:
+            seen.append(page)
+            yield page
+        self.cache.put(key, op_name, seen)
 
     def call(self, op_name, query=None, **kwargs):
         """
@@ -98,6 +251,8 @@ class AWSClient(object):
             will be applied to the data returned from the low-level
             call.  This allows you to tailor the returned data to be
             exactly what you want.
+          * If the client has a ``ResponseCache`` the response is
+            served from there when possible.
 
         :type op_name: str
         :param op_name: The name of the request you wish to make.
@@ -112,34 +267,67 @@ class AWSClient(object):
             to the method when making the request.
         """
         LOG.debug(kwargs)
-        if query:
-            query = jmespath.compile(query)
-        if self._client.can_paginate(op_name):
-            paginator = self._client.get_paginator(op_name)
-            results = paginator.paginate(**kwargs)
-            data = results.build_full_result()
+        if self.cache is None:
+            data = self._call(op_name, **kwargs)
         else:
-            op = getattr(self._client, op_name)
-            done = False
+            key = self._cache_key(op_name, kwargs)
+            data = self.cache.get(key)
+            if data is None and not self.cache.offline:
+                data = self._call(op_name, **kwargs)
+                if data is not None:
+                    self.cache.put(key, op_name, data)
+        if data is None:
             data = {}
-            while not done:
-                try:
-                    data = op(**kwargs)
-                    done = True
-                except ClientError as e:
-                    LOG.debug(e, kwargs)
-                    if 'Throttling' in str(e):
-                        time.sleep(1)
-                    elif 'AccessDenied' in str(e):
-                        done = True
-                    elif 'NoSuchTagSet' in str(e):
-                        done = True
-                except Exception:
-                    done = True
         if query:
-            data = query.search(data)
+            data = skew.query.search(query, data)
         return data
 
+    def iter_call(self, op_name, query=None, **kwargs):
+        """
+        Make a request to a method in this client and yield the results
+        as each page arrives rather than waiting for the full result.
+
+        The optional jmespath ``query`` is applied to each page in turn.
+        If it selects a list, each item of the list is yielded, otherwise
+        the selected value itself is yielded.  Without a query the pages
+        themselves are yielded.  Nothing is retained between pages so
+        memory use does not grow with the size of the result.
+
+        :type op_name: str
+        :param op_name: The name of the request you wish to make.
+
+        :type query: str
+        :param query: A jmespath query that will be applied to each page
+            of data returned by the operation.
+
+        :type kwargs: keyword arguments
+        :param kwargs: Additional keyword arguments you want to pass
+            to the method when making the request.
+        """
+        LOG.debug(kwargs)
+        if query:
+            query = skew.query.compile_query(query)
+        if self.cache is None:
+            pages = self._iter_pages(op_name, **kwargs)
+        else:
+            key = self._cache_key(op_name, kwargs, kind='pages')
+            pages = self.cache.get(key)
+            if pages is None:
+                if self.cache.offline:
+                    pages = []
+                else:
+                    pages = self._cache_pages(
+                        key, op_name, self._iter_pages(op_name, **kwargs))
+        for page in pages:
+            data = query.search(page) if query else page
+            if data is None:
+                continue
+            if isinstance(data, list):
+                for item in data:
+                    yield item
+            else:
+                yield data
+
 
 def get_awsclient(service_name, region_name, account_id, **kwargs):
     if region_name == '':
@@ -0,0 +1,193 @@
+# Copyright 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from dateutil.parser import parse as parse_date
+
+LOG = logging.getLogger(__name__)
+
+
+def _encode(obj):
+    if isinstance(obj, datetime.datetime):
+        return {'__datetime__': obj.isoformat()}
+    return str(obj)
+
+
+def _decode(obj):
+    if '__datetime__' in obj and len(obj) == 1:
+        return parse_date(obj['__datetime__'])
+    return obj
+
+
+class ResponseCache(object):
+    """
+    An on-disk cache of AWS responses.
+
+    Pass an instance to ``scan`` (or ``get_awsclient``) as ``cache`` and
+    every ``AWSClient.call`` and ``AWSClient.iter_call`` will look for a
+    response here before calling AWS.  Responses are keyed by account,
+    region, service, operation and parameters and each entry is a
+    separate file, written atomically, so several processes can share
+    the same directory.
+
+    :type path: str
+    :param path: The directory the responses are stored in.  It is
+        created if it does not exist.
+
+    :type ttl: int
+    :param ttl: How long, in seconds, a response stays fresh.
+
+    :type ttls: dict
+    :param ttls: Per-operation overrides of ``ttl``, keyed by operation
+        name (e.g. ``{'describe_instances': 60}``).
+
+    :type max_size: int
+    :param max_size: The maximum total size of the cache in bytes.  When
+        it is exceeded the least recently used responses are removed.
+
+    :type offline: bool
+    :param offline: If True, AWS is never called.  Responses that are in
+        the cache are returned regardless of their age and anything else
+        is treated as an empty response.
+    """
+
+    DefaultTTLs = {
+        'get_bucket_location': 24 * 60 * 60,
+    }
+
+    def __init__(self, path, ttl=300, ttls=None, max_size=256 * 1024 * 1024,
+                 offline=False):
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self.ttls = dict(self.DefaultTTLs)
+        if ttls:
+            self.ttls.update(ttls)
+        self.max_size = max_size
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._size = None
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def key(self, account_id, region_name, service_name, op_name, params,
+            kind='call'):
+        """
+        Build the cache key for a request.  ``kind`` separates whole
+        responses from page lists for the same request.
+        """
+        normalized = json.dumps(
+            [kind, account_id, region_name, service_name, op_name, params],
+            sort_keys=True, default=_encode)
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def _file_path(self, key):
+        return os.path.join(self.path, key[:2], key + '.json')
+
+    def get(self, key):
+        """
+        Return the cached value for ``key`` or None if there isn't a
+        fresh one.
+        """
+        file_path = self._file_path(key)
+        try:
+            with open(file_path) as fp:
+                entry = json.load(fp, object_hook=_decode)
+        except (IOError, OSError, ValueError):
+            return None
+        if not self.offline and entry['expires'] < time.time():
+            LOG.debug('cache entry %s has expired', key)
+            return None
+        try:
+            # Reading counts as a use for LRU eviction.
+            os.utime(file_path, None)
+        except OSError:
+            pass
+        return entry['value']
+
+    def put(self, key, op_name, value):
+        ttl = self.ttls.get(op_name, self.ttl)
+        entry = {'expires': time.time() + ttl, 'op': op_name,
+                 'value': value}
+        file_path = self._file_path(key)
+        dir_path = os.path.dirname(file_path)
+        if not os.path.isdir(dir_path):
+            try:
+                os.makedirs(dir_path)
+            except OSError:
+                # another writer got there first
+                pass
+        fd, tmp_path = tempfile.mkstemp(dir=dir_path, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(entry, fp, default=_encode)
+            os.replace(tmp_path, file_path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        self._account(os.path.getsize(file_path))
+
+    def _entries(self):
+        for dir_entry in os.scandir(self.path):
+            if not dir_entry.is_dir():
+                continue
+            for file_entry in os.scandir(dir_entry.path):
+                if file_entry.name.endswith('.json'):
+                    try:
+                        stat = file_entry.stat()
+                    except OSError:
+                        continue
+                    yield file_entry.path, stat.st_size, stat.st_mtime
+
+    def _account(self, nbytes):
+        with self._lock:
+            if self._size is None:
+                self._size = sum(e[1] for e in self._entries())
+            else:
+                self._size += nbytes
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        # Rescan rather than trusting our running total since other
+        # processes may be writing to the same directory.
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        size = sum(e[1] for e in entries)
+        target = self.max_size * 0.9
+        for file_path, file_size, _ in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(file_path)
+                size -= file_size
+            except OSError:
+                pass
+        LOG.debug('cache size after eviction: %d', size)
+        self._size = size
+
+    def clear(self):
+        with self._lock:
+            for file_path, _, _ in list(self._entries()):
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+            self._size = 0
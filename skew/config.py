@@ -15,8 +15,6 @@
 import os
 import logging
 
-import yaml
-
 from skew.exception import ConfigNotFoundError
 
 LOG = logging.getLogger(__name__)
@@ -33,6 +31,8 @@ def get_config():
         path = os.path.expandvars(path)
         if not os.path.exists(path):
             raise ConfigNotFoundError('Unable to find skew config file')
+        # yaml is only imported once a config is actually needed.
+        import yaml
         with open(path) as config_file:
             _config = yaml.safe_load(config_file)
     return _config
@@ -0,0 +1,115 @@
+# Copyright 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+LOG = logging.getLogger(__name__)
+
+
+class ScanExecutor(object):
+    """
+    Runs the work units of a scan on a pool of threads and yields the
+    results as each unit completes.
+
+    :type max_workers: int
+    :param max_workers: The size of the thread pool.
+
+    :type max_per_service: int or dict
+    :param max_per_service: The maximum number of units for any one
+        service that may be running at the same time.  This can either
+        be a single number that applies to all services or a dictionary
+        mapping service names to a limit.  Services not in the dictionary
+        are only limited by ``max_workers``.
+
+    :type max_per_account: int
+    :param max_per_account: The maximum number of units for any one
+        account that may be running at the same time.
+
+    Units are only handed to the pool when the limits allow it so a
+    throttled service never ties up threads that other services could use.
+    """
+
+    def __init__(self, max_workers=8, max_per_service=None,
+                 max_per_account=None):
+        self.max_workers = max_workers
+        self.max_per_service = max_per_service
+        self.max_per_account = max_per_account
+        self._running_services = collections.Counter()
+        self._running_accounts = collections.Counter()
+
+    def _service_limit(self, service):
+        if isinstance(self.max_per_service, dict):
+            return self.max_per_service.get(service)
+        return self.max_per_service
+
+    def _can_start(self, unit):
+        limit = self._service_limit(unit.service)
+        if limit and self._running_services[unit.service] >= limit:
+            return False
+        if self.max_per_account and \
+                self._running_accounts[unit.account] >= self.max_per_account:
+            return False
+        return True
+
+    def _start(self, pool, fn, unit):
+        LOG.debug('starting %s', str(unit))
+        self._running_services[unit.service] += 1
+        self._running_accounts[unit.account] += 1
+        return pool.submit(self._run_unit, fn, unit)
+
+    def _run_unit(self, fn, unit):
+        # fn may well return a generator so make sure all of the work
+        # happens here on the worker thread.
+        return list(fn(unit))
+
+    def _finish(self, unit):
+        self._running_services[unit.service] -= 1
+        self._running_accounts[unit.account] -= 1
+
+    def run(self, units, fn):
+        """
+        Call ``fn`` for each of the ``units`` and yield each item of the
+        iterable it returns.  Items are yielded in the order the units
+        complete, not the order the units were given in.  An exception
+        raised by any unit is re-raised here and the remaining units
+        are cancelled.
+        """
+        pending = collections.deque(units)
+        running = {}
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while pending or running:
+                # Start as many units as the limits allow.  Units that
+                # can't start yet keep their place in the queue.
+                deferred = collections.deque()
+                while pending and len(running) < self.max_workers:
+                    unit = pending.popleft()
+                    if self._can_start(unit):
+                        running[self._start(pool, fn, unit)] = unit
+                    else:
+                        deferred.append(unit)
+                deferred.extend(pending)
+                pending = deferred
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    unit = running.pop(future)
+                    self._finish(unit)
+                    for item in future.result():
+                        yield item
+        finally:
+            for future in running:
+                future.cancel()
+            pool.shutdown(wait=False)
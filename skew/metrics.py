@@ -0,0 +1,476 @@
+# Copyright 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Looks up CloudWatch metrics for many resources at once.
+
+``AWSResource.get_metric_data`` makes one ``GetMetricStatistics`` call
+per resource.  ``fetch`` packs the same request for many resources into
+``GetMetricData`` calls instead, up to ``MaxQueries`` metrics each, and
+makes the calls for different regions and accounts at the same time.
+
+The metrics available to resources whose class declares a ``namespace``
+come from a ``MetricIndex`` of the whole namespace, built with a single
+paginated ``ListMetrics`` call per account and region and cached for
+``MetricIndexTTL`` seconds.
+"""
+
+import datetime
+import logging
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import dateutil.tz
+
+import skew.awsclient
+import skew.resources.aws
+
+LOG = logging.getLogger(__name__)
+
+MetricIndexTTL = 15 * 60
+
+_indexes = {}
+_index_locks = {}
+_lock = threading.Lock()
+
+NaN = float('nan')
+
+# The most metrics one GetMetricData call may ask for.
+MaxQueries = 500
+
+# The most datapoints one GetMetricData call may return.
+MaxDatapoints = 100800
+
+
+class MetricIndex(object):
+    """
+    The metrics of one namespace in one account and region, indexed by
+    each of their dimensions.
+    """
+
+    def __init__(self, metrics):
+        self._index = {}
+        for metric in metrics:
+            for dimension in metric.get('Dimensions', []):
+                key = (dimension['Name'], dimension['Value'])
+                self._index.setdefault(key, OrderedDict()).setdefault(
+                    metric['MetricName'], []).append(metric)
+
+    def metrics(self, name, value):
+        """
+        Return all the metrics with the dimension ``name`` set to
+        ``value``.
+        """
+        metrics = []
+        for matches in self._index.get((name, value), {}).values():
+            metrics.extend(matches)
+        return metrics
+
+    def find(self, name, value, metric_name):
+        """
+        Return the first metric called ``metric_name`` with the dimension
+        ``name`` set to ``value``, or None.
+        """
+        matches = self._index.get((name, value), {}).get(metric_name)
+        return matches[0] if matches else None
+
+
+def metric_index(account, region, namespace):
+    """
+    Return the ``MetricIndex`` of ``namespace`` in ``account`` and
+    ``region``, calling ``ListMetrics`` only when there is no index
+    younger than ``MetricIndexTTL`` seconds.
+    """
+    key = (account, region, namespace)
+    with _lock:
+        key_lock = _index_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        with _lock:
+            cached = _indexes.get(key)
+        if cached is not None and cached[0] > time.time():
+            return cached[1]
+        client = skew.awsclient.get_awsclient('cloudwatch', region, account)
+        metrics = list(client.iter_call('list_metrics', query='Metrics',
+                                        Namespace=namespace))
+        LOG.debug('indexed %d %s metrics in %s/%s',
+                  len(metrics), namespace, region, account)
+        index = MetricIndex(metrics)
+        with _lock:
+            _indexes[key] = (time.time() + MetricIndexTTL, index)
+        return index
+
+
+def clear():
+    with _lock:
+        _indexes.clear()
+
+
+def window(days=None, hours=1, minutes=None, period=None):
+    """
+    Return the ``(start, end, period)`` of a request for the last
+    ``days``, ``hours`` or ``minutes``, working out the period just as
+    ``AWSResource.get_metric_data`` does if it isn't given.
+    """
+    if days:
+        delta = datetime.timedelta(days=days)
+    elif hours:
+        delta = datetime.timedelta(hours=hours)
+    else:
+        delta = datetime.timedelta(minutes=minutes)
+    if not period:
+        period = max(60, int(delta.total_seconds()) // 1440)
+    end = datetime.datetime.utcnow()
+    return end - delta, end, period
+
+
+def metric_query(resource, metric_name):
+    """
+    Return the namespace and dimensions of ``metric_name`` for
+    ``resource``, or None if it doesn't have that metric.  The metric
+    is found with ``find_metric`` so it has all of its dimensions (e.g.
+    both ``CacheClusterId`` and ``CacheNodeId`` for ElastiCache).  For
+    resource classes with a ``namespace`` in their ``Meta`` that costs
+    no calls per resource, the shared ``MetricIndex`` is used.
+    """
+    metric = resource.find_metric(metric_name)
+    if metric is None:
+        return None
+    return metric['Namespace'], metric['Dimensions']
+
+
+def split_window(start, end, period, max_points):
+    """
+    Split the time from ``start`` to ``end`` into windows with at most
+    ``max_points`` periods in each.
+    """
+    step = datetime.timedelta(seconds=period * max_points)
+    windows = []
+    while start < end:
+        windows.append((start, min(start + step, end)))
+        start += step
+    return windows
+
+
+def _fetch_batch(client, queries, start, end):
+    # Returns {query id: {timestamp: value}}, following NextToken and
+    # merging the partial results of each page.
+    values = {}
+    results = client.iter_call('get_metric_data', query='MetricDataResults',
+                               MetricDataQueries=queries,
+                               StartTime=start, EndTime=end)
+    for result in results:
+        series = values.setdefault(result['Id'], {})
+        for timestamp, value in zip(result.get('Timestamps') or [],
+                                    result.get('Values') or []):
+            series[timestamp] = value
+    return values
+
+
+def fetch(resources, metric_name, statistics=None, days=None, hours=1,
+          minutes=None, period=None, max_workers=8):
+    """
+    Get the data of ``metric_name`` for each of ``resources``.  The
+    time frame and ``period`` work just as they do for
+    ``AWSResource.get_metric_data``.
+
+    :type resources: list
+    :param resources: The resources to fetch the metric for.  They can
+        be from any mix of regions and accounts.
+
+    :type metric_name: str
+    :param metric_name: The name of the metric.
+
+    :type statistics: list of str
+    :param statistics: The statistics to return.  The default is
+        **Average**.
+
+    :type max_workers: int
+    :param max_workers: The most GetMetricData calls made at once.
+
+    :returns: A list with a ``MetricData`` for each resource, in the
+        same order, or None for resources without the metric.  Like the
+        data returned by ``get_metric_data``, each datapoint is a dict
+        with a ``Timestamp`` and a value for each statistic, but the
+        dicts are only built if ``data`` is used rather than the arrays.
+    """
+    if not statistics:
+        statistics = ['Average']
+    start, end, period = window(days, hours, minutes, period)
+    resources = list(resources)
+    # Group the queries by the CloudWatch client that has to make them.
+    groups = OrderedDict()
+    owners = {}
+    for i, resource in enumerate(resources):
+        client = resource.cloudwatch
+        query = metric_query(resource, metric_name) if client else None
+        if query is None:
+            continue
+        namespace, dimensions = query
+        key = (client.region_name, client.account_id)
+        group = groups.setdefault(key, (client, []))
+        for statistic in statistics:
+            query_id = 'q%d' % len(owners)
+            owners[query_id] = (i, statistic)
+            group[1].append({
+                'Id': query_id,
+                'MetricStat': {
+                    'Metric': {'Namespace': namespace,
+                               'MetricName': metric_name,
+                               'Dimensions': dimensions},
+                    'Period': period,
+                    'Stat': statistic},
+                'ReturnData': True})
+    # Keep each call under the datapoint limit, splitting the time frame
+    # when even a single query would exceed it.
+    points = max(1, int((end - start).total_seconds()) // period)
+    per_call = max(1, min(MaxQueries, MaxDatapoints // points))
+    windows = split_window(start, end, period, MaxDatapoints)
+    batches = []
+    for client, queries in groups.values():
+        for j in range(0, len(queries), per_call):
+            for batch_start, batch_end in windows:
+                batches.append((client, queries[j:j + per_call],
+                                batch_start, batch_end))
+    LOG.debug('fetching %s for %d resources with %d calls',
+              metric_name, len(resources), len(batches))
+    datapoints = [None] * len(resources)
+    if batches:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(_fetch_batch, *b) for b in batches]
+            for future in futures:
+                for query_id, series in future.result().items():
+                    i, statistic = owners[query_id]
+                    if datapoints[i] is None:
+                        datapoints[i] = {}
+                    for timestamp, value in series.items():
+                        datapoints[i].setdefault(timestamp, {})[
+                            statistic] = value
+    owned = set(i for i, _ in owners.values())
+    results = []
+    for i in range(len(resources)):
+        if i not in owned:
+            results.append(None)
+            continue
+        series = datapoints[i] or {}
+        timestamps = sorted(series)
+        columns = dict(
+            (statistic, [series[t].get(statistic, NaN) for t in timestamps])
+            for statistic in statistics)
+        results.append(skew.resources.aws.MetricData.from_columns(
+            timestamps, columns, period))
+    return results
+
+
+def aggregate(metric_data, statistic='Average', how='percentile', q=95):
+    """
+    Combine the ``statistic`` of many ``MetricData`` (e.g. the results
+    of ``fetch``) into one, with a value for each timestamp that any of
+    them has.  ``how`` is ``percentile`` (the ``q``th percentile across
+    the resources), ``mean``, ``sum``, ``max`` or ``min``.  Needs numpy.
+
+    :returns: A ``MetricData`` with a single statistic named after
+        ``how`` (e.g. ``p95`` or ``mean``).
+    """
+    np = skew.resources.aws._numpy()
+    reducers = {'mean': np.nanmean, 'sum': np.nansum,
+                'max': np.nanmax, 'min': np.nanmin}
+    if how != 'percentile' and how not in reducers:
+        raise ValueError('Unknown aggregation (%s)' % how)
+    metric_data = [m for m in metric_data if m is not None]
+    period = max([m.period for m in metric_data] or [60])
+    timestamps = np.unique(np.concatenate(
+        [m.timestamps for m in metric_data] or [np.empty(0)]))
+    matrix = np.full((len(metric_data), len(timestamps)), np.nan)
+    for row, m in zip(matrix, metric_data):
+        if statistic in m.statistics:
+            row[np.searchsorted(timestamps, m.timestamps)] = \
+                m.values(statistic)
+    label = 'p%s' % q if how == 'percentile' else how
+    values = np.empty(0)
+    if len(timestamps):
+        # Timestamps where none of the resources have a value are NaN.
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            if how == 'percentile':
+                values = np.nanpercentile(matrix, q, axis=0)
+            else:
+                values = reducers[how](matrix, axis=0)
+    return skew.resources.aws.MetricData.from_columns(
+        timestamps, {label: values}, period)
+
+
+def _missing(low, high, start, end):
+    # The parts of [start, end) outside of [low, high).
+    if low is None or end <= low or start >= high:
+        return [(start, end)]
+    ranges = []
+    if start < low:
+        ranges.append((start, low))
+    if end > high:
+        ranges.append((high, end))
+    return ranges
+
+
+class _Series(object):
+    # The cached datapoints of one statistic of one metric at one period:
+    # {bucket start: value} and the range [low, high) of buckets known
+    # to be complete.
+
+    def __init__(self):
+        self.points = {}
+        self.low = self.high = None
+        self.unit = None
+        self.used = time.time()
+
+    def covered(self, start, end):
+        if start >= end:
+            return
+        if self.low is None or end < self.low or start > self.high:
+            # Not contiguous with what we have, start over.
+            self.points = dict((t, v) for t, v in self.points.items()
+                               if start <= t < end)
+            self.low, self.high = start, end
+        else:
+            self.low, self.high = min(self.low, start), max(self.high, end)
+
+    def trim(self, before):
+        self.points = dict((t, v) for t, v in self.points.items()
+                           if t >= before)
+        if self.low is not None and self.low < before:
+            self.low = min(before, self.high)
+
+
+class DatapointCache(object):
+    """
+    An in-memory cache of CloudWatch datapoints for callers that ask
+    for the same metrics over a sliding time frame, such as dashboards.
+
+    Datapoints are stored per metric, statistic and period in buckets
+    aligned to the period.  Pass the cache to
+    ``AWSResource.get_metric_data`` as ``cache`` and only the buckets
+    before or after those already cached are requested from CloudWatch.
+    Buckets newer than ``settle`` seconds may still change, so they are
+    requested again every time.
+
+    :type max_age: int
+    :param max_age: Metrics that haven't been asked for in this many
+        seconds are removed, as are datapoints this much older than the
+        start of the latest request for them.
+
+    :type max_points: int
+    :param max_points: The most datapoints kept.  When there are more,
+        the least recently used metrics are removed.
+
+    :type settle: int
+    :param settle: How long, in seconds, CloudWatch may take to finish
+        a bucket.
+    """
+
+    def __init__(self, max_age=60 * 60, max_points=1000000, settle=5 * 60):
+        self.max_age = max_age
+        self.max_points = max_points
+        self.settle = settle
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(s.points) for s in self._series.values())
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def _key(self, client, metric, statistic, period):
+        dimensions = tuple(sorted((d['Name'], d['Value'])
+                                  for d in metric['Dimensions']))
+        return (client.account_id, client.region_name, metric['Namespace'],
+                metric['MetricName'], dimensions, statistic, period)
+
+    def _evict(self, now):
+        for key in list(self._series):
+            if self._series[key].used < now - self.max_age:
+                del self._series[key]
+        total = sum(len(s.points) for s in self._series.values())
+        while total > self.max_points and self._series:
+            _, series = self._series.popitem(last=False)
+            total -= len(series.points)
+
+    def get_metric_data(self, client, metric, statistics, start, end,
+                        period):
+        """
+        Return the ``MetricData`` of ``metric`` from ``start`` to ``end``
+        (datetimes), calling ``GetMetricStatistics`` with ``client`` for
+        whatever isn't cached.
+        """
+        epoch_seconds = skew.resources.aws.epoch_seconds
+        now = time.time()
+        start = int(epoch_seconds(start)) // period * period
+        end = -(-int(epoch_seconds(end)) // period) * period
+        settled = int(now - self.settle) // period * period
+        with self._lock:
+            series = []
+            for statistic in statistics:
+                key = self._key(client, metric, statistic, period)
+                if key not in self._series:
+                    self._series[key] = _Series()
+                self._series.move_to_end(key)
+                self._series[key].used = now
+                self._series[key].trim(start - self.max_age)
+                series.append(self._series[key])
+            # Buckets missing for any of the statistics are fetched for
+            # all of them.
+            if any(s.low is None for s in series):
+                ranges = [(start, end)]
+            else:
+                ranges = _missing(max(s.low for s in series),
+                                  min(s.high for s in series), start, end)
+        for range_start, range_end in ranges:
+            LOG.debug('fetching %s from %s to %s',
+                      metric['MetricName'], range_start, range_end)
+            datapoints = client.call(
+                'get_metric_statistics',
+                Dimensions=metric['Dimensions'],
+                Namespace=metric['Namespace'],
+                MetricName=metric['MetricName'],
+                StartTime=_utc(range_start), EndTime=_utc(range_end),
+                Statistics=statistics, Period=period, query='Datapoints')
+            with self._lock:
+                for datapoint in datapoints or []:
+                    bucket = int(epoch_seconds(datapoint['Timestamp']))
+                    for statistic, s in zip(statistics, series):
+                        if statistic in datapoint:
+                            s.points[bucket] = datapoint[statistic]
+                            s.unit = datapoint.get('Unit')
+                for s in series:
+                    s.covered(range_start, min(range_end, settled))
+        with self._lock:
+            points = {}
+            for statistic, s in zip(statistics, series):
+                for bucket, value in s.points.items():
+                    if start <= bucket < end:
+                        point = points.setdefault(
+                            bucket, {'Timestamp': _utc(bucket)})
+                        point[statistic] = value
+                        if s.unit:
+                            point['Unit'] = s.unit
+            self._evict(now)
+        return skew.resources.aws.MetricData(list(points.values()), period)
+
+
+def _utc(seconds):
+    return datetime.datetime.fromtimestamp(seconds, dateutil.tz.tzutc())
@@ -0,0 +1,183 @@
+# Copyright 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Plans scans without running them.
+
+``ARN.plan`` expands an ARN into the work units a scan would run and
+estimates the calls each of them would make from the ``Meta`` of the
+resource classes involved.  A ``ScanPlan`` can be inspected, saved,
+split into shards and run later, possibly somewhere else.
+"""
+
+import collections
+import json
+import logging
+import math
+
+import skew.resources
+
+LOG = logging.getLogger(__name__)
+
+# One work unit of a plan: the call that lists its resources, the
+# number of calls made once for the whole unit (that one included) and
+# the estimated number of calls per resource made while enumerating, to
+# fill in their details (``detail_spec`` and ``attr_spec``) and to fetch
+# their tags (``tags_spec``, shared between the resources of a
+# ``tags_batch_spec`` call).
+PlanStep = collections.namedtuple(
+    'PlanStep', ['unit', 'operation', 'unit_calls', 'scan_calls',
+                 'detail_calls', 'tag_calls'])
+
+# Calls some resource types make that their Meta doesn't describe, as
+# (operation, when) where ``when`` is ``unit`` for a call made once per
+# unit, ``scan`` for one made for each resource as it is enumerated and
+# ``details`` for one made for each resource as it is hydrated.
+ExtraCalls = {
+    'aws.iam.user': [('get_user_policy', 'details')],
+    'aws.lambda.function': [('list_event_source_mappings', 'unit')],
+    'aws.s3.bucket': [('get_bucket_location', 'scan')],
+}
+
+
+def resource_calls(resource_path, resource_cls):
+    """
+    Return the enumeration operation of ``resource_cls`` (found at
+    ``resource_path``) and the number of calls it makes per unit and
+    per resource, as the fields of a ``PlanStep``.
+    """
+    meta = resource_cls.Meta
+    enum_spec = getattr(meta, 'enum_spec', None)
+    operation = enum_spec[0] if enum_spec else None
+    # Only the fetches hydrating actually makes are counted.
+    lazy_names = getattr(resource_cls, '_lazy_names', None)
+    calls = {'unit': 1, 'scan': 0,
+             'details': len(lazy_names()) if lazy_names else 0}
+    for _, when in ExtraCalls.get(resource_path, []):
+        calls[when] += 1
+    tag_calls = 0.0
+    if getattr(meta, 'tags_batch_spec', None):
+        tag_calls = 1.0 / meta.tags_batch_spec[0]
+    elif getattr(meta, 'tags_spec', None):
+        tag_calls = 1.0
+    return (operation, calls['unit'], calls['scan'], calls['details'],
+            tag_calls)
+
+
+def plan_step(unit):
+    resource_path = '.'.join([unit.provider, unit.service,
+                              unit.resource_type])
+    resource_cls = skew.resources.find_resource_class(resource_path)
+    return PlanStep(unit, *resource_calls(resource_path, resource_cls))
+
+
+class ScanPlan(object):
+    """
+    The work units a scan of ``arn`` (an ARN string) would run, in the
+    order it would run them, as a list of ``PlanStep``.
+    """
+
+    def __init__(self, arn, steps):
+        self.arn = arn
+        self.steps = list(steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    @property
+    def units(self):
+        return [step.unit for step in self.steps]
+
+    def calls(self, resources_per_unit=0, details=False, tags=False,
+              by=None):
+        """
+        Estimate the number of calls the scan will make.
+
+        :type resources_per_unit: int
+        :param resources_per_unit: The number of resources expected in
+            each work unit.  Every unit makes at least one call, plus
+            any calls its resources need as they are enumerated.
+
+        :type details: bool
+        :param details: Count the calls that fill in the details of
+            each resource, as ``hydrate`` would.
+
+        :type tags: bool
+        :param tags: Count the calls that fetch the tags of each
+            resource, as ``load_tags`` would.
+
+        :type by: str
+        :param by: A ``WorkUnit`` field (e.g. ``service`` or
+            ``account``) to break the estimate down by.
+
+        :returns: The number of calls or, with ``by``, a dictionary of
+            the number of calls for each value of the field.
+        """
+        totals = collections.OrderedDict()
+        for step in self.steps:
+            per_resource = float(step.scan_calls)
+            if details:
+                per_resource += step.detail_calls
+            if tags:
+                per_resource += step.tag_calls
+            key = getattr(step.unit, by) if by else None
+            totals[key] = totals.get(key, 0) + step.unit_calls + int(
+                math.ceil(resources_per_unit * per_resource))
+        if by:
+            return dict(totals)
+        return totals.get(None, 0)
+
+    def shard(self, count):
+        """
+        Split the plan into ``count`` plans of roughly the same size.
+        """
+        return [ScanPlan(self.arn, self.steps[i::count])
+                for i in range(count)]
+
+    def run(self, **kwargs):
+        """
+        Run the scan, returning an iterator over the resources (or
+        changes) just like iterating over an ``ARN``.  The ``kwargs``
+        are the options you would pass to ``scan``.
+        """
+        import skew.arn
+        arn = skew.arn.ARN(self.arn, **kwargs)
+        return arn.scan_units(self.units)
+
+    def to_dict(self):
+        return {'version': 1, 'arn': self.arn,
+                'steps': [dict(step._asdict(), unit=list(step.unit))
+                          for step in self.steps]}
+
+    @classmethod
+    def from_dict(cls, data):
+        import skew.arn
+        steps = []
+        for step in data['steps']:
+            step = dict(step)
+            step['unit'] = skew.arn.WorkUnit(*step['unit'])
+            steps.append(PlanStep(**step))
+        return cls(data['arn'], steps)
+
+    def save(self, path):
+        with open(path, 'w') as fp:
+            json.dump(self.to_dict(), fp)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fp:
+            return cls.from_dict(json.load(fp))
@@ -0,0 +1,93 @@
+# Copyright 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A shared cache of compiled jmespath expressions.
+
+The same handful of expressions (the paths in each resource class's
+``Meta``) are applied to every resource a scan returns so rather than
+parsing them again each time we compile each one once and keep it.
+"""
+
+import threading
+from collections import OrderedDict
+
+MaxCachedExpressions = 512
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_precompiled = set()
+
+
+def compile_query(expression):
+    """
+    Return the compiled form of the jmespath ``expression``, compiling
+    it only if it is not already in the cache.
+    """
+    with _lock:
+        compiled = _cache.get(expression)
+        if compiled is not None:
+            _cache.move_to_end(expression)
+            return compiled
+    # jmespath is imported on first use to keep ``import skew`` cheap.
+    import jmespath
+    compiled = jmespath.compile(expression)
+    with _lock:
+        _cache[expression] = compiled
+        if len(_cache) > MaxCachedExpressions:
+            _cache.popitem(last=False)
+    return compiled
+
+
+def search(expression, data):
+    """
+    Apply the jmespath ``expression`` to ``data``.  A None expression
+    returns None.
+    """
+    if expression is None:
+        return None
+    return compile_query(expression).search(data)
+
+
+def _meta_paths(meta):
+    for attr in ('name', 'date'):
+        yield getattr(meta, attr, None)
+    enum_spec = getattr(meta, 'enum_spec', None)
+    if enum_spec:
+        yield enum_spec[1]
+    detail_spec = getattr(meta, 'detail_spec', None)
+    if detail_spec:
+        yield detail_spec[-1]
+    tags_spec = getattr(meta, 'tags_spec', None)
+    if tags_spec:
+        yield tags_spec[1]
+    tags_batch_spec = getattr(meta, 'tags_batch_spec', None)
+    if tags_batch_spec:
+        yield tags_batch_spec[1]
+    for attr in getattr(meta, 'attr_spec', None) or []:
+        yield attr[2]
+
+
+def precompile(resource_cls):
+    """
+    Compile all of the jmespath paths in the ``Meta`` of
+    ``resource_cls`` so the first resources of that type do not pay
+    for it.
+    """
+    if resource_cls in _precompiled:
+        return
+    for path in _meta_paths(resource_cls.Meta):
+        if isinstance(path, str):
+            compile_query(path)
+    _precompiled.add(resource_cls)
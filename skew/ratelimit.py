@@ -0,0 +1,223 @@
+# Copyright 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import random
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+ThrottlingErrorCodes = frozenset([
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'RequestThrottledException',
+    'TooManyRequestsException',
+    'ProvisionedThroughputExceededException',
+    'TransactionInProgressException',
+    'RequestLimitExceeded',
+    'BandwidthLimitExceeded',
+    'LimitExceededException',
+    'RequestThrottled',
+    'SlowDown',
+    'PriorRequestNotComplete',
+    'EC2ThrottledException',
+])
+
+
+def is_throttle(response):
+    """
+    Returns True if the botocore ``response`` tuple of
+    ``(http_response, parsed)`` represents a throttled request.
+    """
+    if not response:
+        return False
+    http_response, parsed = response
+    code = parsed.get('Error', {}).get('Code') if parsed else None
+    if code in ThrottlingErrorCodes:
+        return True
+    return getattr(http_response, 'status_code', None) == 429
+
+
+class TokenBucket(object):
+    """
+    A thread-safe token bucket.  Tokens are added at ``rate`` per
+    second up to ``capacity`` and each request takes one.
+    """
+
+    def __init__(self, rate, capacity):
+        self._lock = threading.Lock()
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.time()
+
+    def _refill(self, now):
+        elapsed = max(0.0, now - self._last)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._last = now
+
+    def acquire(self):
+        """
+        Take a token, sleeping until one is available.  Returns the
+        number of seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.time())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RateController(object):
+    """
+    Controls the request rate for one endpoint (an account, region and
+    service) and decides how throttled requests are retried.
+
+    The rate adapts AIMD-style: every successful request adds
+    ``increase`` requests per second, up to ``max_rate``, and every
+    throttled request multiplies the rate by ``decrease``, down to
+    ``min_rate``.  Throttled requests are retried after a capped
+    exponential backoff with full jitter.  Retries are paid for out of
+    a shared budget that is refilled a little by each success so a
+    badly throttled endpoint stops retrying rather than piling on.
+    """
+
+    initial_rate = 25.0
+    min_rate = 0.5
+    max_rate = 100.0
+    increase = 0.5
+    decrease = 0.5
+    base_delay = 0.2
+    max_delay = 20.0
+    max_attempts = 8
+    retry_budget = 100.0
+    budget_refill = 0.1
+
+    def __init__(self, name=None):
+        self.name = name
+        self._lock = threading.Lock()
+        self._bucket = TokenBucket(self.initial_rate, self.initial_rate)
+        self._budget = self.retry_budget
+        self.requests = 0
+        self.throttles = 0
+        self.retries = 0
+        self.giveups = 0
+        self.wait_time = 0.0
+
+    @property
+    def rate(self):
+        return self._bucket.rate
+
+    def acquire(self, **kwargs):
+        waited = self._bucket.acquire()
+        with self._lock:
+            self.requests += 1
+            self.wait_time += waited
+
+    def on_success(self):
+        with self._lock:
+            self._bucket.rate = min(self.max_rate,
+                                    self._bucket.rate + self.increase)
+            self._budget = min(self.retry_budget,
+                               self._budget + self.budget_refill)
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttles += 1
+            self._bucket.rate = max(self.min_rate,
+                                    self._bucket.rate * self.decrease)
+
+    def backoff(self, attempts):
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempts))
+        return random.uniform(0, ceiling)
+
+    def needs_retry(self, response=None, attempts=1, **kwargs):
+        """
+        A botocore ``needs-retry`` handler.  Returns the number of
+        seconds to sleep before retrying a throttled request, False if
+        a throttled request should not be retried, or None to leave the
+        decision to botocore's own retry handler.
+        """
+        if not is_throttle(response):
+            if response is not None:
+                self.on_success()
+            return None
+        self.on_throttle()
+        with self._lock:
+            if attempts >= self.max_attempts or self._budget < 1:
+                self.giveups += 1
+                LOG.debug('%s: giving up after %d attempts',
+                          self.name, attempts)
+                return False
+            self._budget -= 1
+            self.retries += 1
+            delay = self.backoff(attempts)
+            self.wait_time += delay
+        LOG.debug('%s: throttled, retrying in %.2fs', self.name, delay)
+        return delay
+
+    def attach(self, client):
+        """
+        Register this controller's handlers with a botocore client so
+        that every request it sends, including each page of a paginated
+        operation, is rate limited and retried.
+        """
+        client.meta.events.register('before-send', self.acquire)
+        # botocore's own retry handler is registered for the service's
+        # needs-retry event and the handlers of a more specific event
+        # run first, so ours has to go ahead of it on the same event.
+        service_id = client.meta.service_model.service_id.hyphenize()
+        client.meta.events.register_first(
+            'needs-retry.%s' % service_id, self.needs_retry)
+
+    def stats(self):
+        with self._lock:
+            return {'rate': self._bucket.rate,
+                    'requests': self.requests,
+                    'throttles': self.throttles,
+                    'retries': self.retries,
+                    'giveups': self.giveups,
+                    'wait_time': self.wait_time}
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_rate_controller(account_id, region_name, service_name):
+    key = (account_id, region_name, service_name)
+    with _controllers_lock:
+        controller = _controllers.get(key)
+        if controller is None:
+            controller = RateController(
+                ':'.join([str(k) for k in key]))
+            _controllers[key] = controller
+        return controller
+
+
+def stats():
+    """
+    Returns the stats of every rate controller, keyed by
+    ``(account_id, region_name, service_name)``.
+    """
+    with _controllers_lock:
+        controllers = list(_controllers.items())
+    return dict((key, c.stats()) for key, c in controllers)
@@ -0,0 +1,105 @@
+# Copyright 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Works out which regions are worth scanning.
+
+The regions a service is available in come from the endpoint data that
+ships with botocore, per partition.  The regions an account has enabled
+come from EC2's ``DescribeRegions`` and are cached per account.
+"""
+
+import logging
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+Partitions = ('aws', 'aws-cn', 'aws-us-gov')
+
+EnabledRegionsTTL = 60 * 60
+
+_session = None
+_service_regions = {}
+_enabled_regions = {}
+_lock = threading.Lock()
+
+
+def partition_for_provider(provider):
+    """
+    The ARN provider component is the partition name (e.g. ``aws`` or
+    ``aws-cn``).  Anything else, such as a wildcard, means ``aws``.
+    """
+    if provider in Partitions:
+        return provider
+    return 'aws'
+
+
+def service_regions(service_name, partition_name='aws'):
+    """
+    Returns the sorted list of regions ``service_name`` is available in
+    within ``partition_name``, or an empty list if botocore has no
+    regional endpoint data for the service.
+    """
+    global _session
+    key = (service_name, partition_name)
+    with _lock:
+        regions = _service_regions.get(key)
+        if regions is None:
+            if _session is None:
+                import botocore.session
+                _session = botocore.session.get_session()
+            try:
+                regions = sorted(_session.get_available_regions(
+                    service_name, partition_name))
+            except Exception as e:
+                LOG.debug(e)
+                regions = []
+            _service_regions[key] = regions
+    return regions
+
+
+def enabled_regions(account_id, **kwargs):
+    """
+    Returns the set of regions enabled in ``account_id``, or None if
+    they could not be determined (in which case no region should be
+    ruled out).  The result is cached for ``EnabledRegionsTTL`` seconds.
+    Any ``kwargs`` are passed on to ``get_awsclient``.
+    """
+    now = time.time()
+    with _lock:
+        cached = _enabled_regions.get(account_id)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+    import skew.awsclient
+    client = skew.awsclient.get_awsclient(
+        'ec2', 'us-east-1', account_id, **kwargs)
+    try:
+        regions = client.call('describe_regions',
+                              query='Regions[].RegionName')
+    except Exception as e:
+        # Not being able to tell shouldn't stop the scan.
+        LOG.warning('unable to find the regions enabled in %s: %s',
+                    account_id, e)
+        regions = None
+    regions = set(regions) if regions else None
+    with _lock:
+        _enabled_regions[account_id] = (now + EnabledRegionsTTL, regions)
+    return regions
+
+
+def clear():
+    with _lock:
+        _service_regions.clear()
+        _enabled_regions.clear()
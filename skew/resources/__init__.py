@@ -13,6 +13,9 @@
 # language governing permissions and limitations under the License.
 
 import importlib
+import threading
+
+import skew.query
 
 # Maps resources names as they appear in ARN's to the path name
 # of the Python class representing that resource.
@@ -72,41 +75,104 @@ ResourceTypes = {
 }
 
 
+# Resource classes registered with ``register_resource``, keyed like
+# ``ResourceTypes``.  The value is either the class itself or the full
+# dotted path of the class.
+_registered = {}
+
+# The resolved class of each resource path.
+_classes = {}
+
+_lock = threading.Lock()
+
+
+class _Index(object):
+    """
+    The providers, services and types of every resource path, computed
+    once.  A new index replaces the old one when a resource is
+    registered, an index itself never changes.
+    """
+
+    def __init__(self, resource_paths):
+        providers = {}
+        for resource_path in resource_paths:
+            provider, service, resource_type = resource_path.split('.', 2)
+            services = providers.setdefault(provider, {})
+            services.setdefault(service, set()).add(resource_type)
+        self.providers = tuple(sorted(providers))
+        self.services = dict(
+            (provider, tuple(sorted(services)))
+            for provider, services in providers.items())
+        self.types = {}
+        for provider, services in providers.items():
+            for service, types in services.items():
+                self.types[(provider, service)] = tuple(sorted(types))
+
+
+def _build_index():
+    return _Index(list(ResourceTypes) + list(_registered))
+
+
+_index = _build_index()
+
+
 def all_providers():
-    providers = set()
-    for resource_type in ResourceTypes:
-        providers.add(resource_type.split('.')[0])
-    return list(providers)
+    return list(_index.providers)
 
 
 def all_services(provider_name):
-    services = set()
-    for resource_type in ResourceTypes:
-        t = resource_type.split('.')
-        if t[0] == provider_name:
-            services.add(t[1])
-    return list(services)
+    return list(_index.services.get(provider_name, ()))
 
 
 def all_types(provider_name, service_name):
-    types = set()
-    for resource_type in ResourceTypes:
-        t = resource_type.split('.')
-        if t[0] == provider_name and t[1] == service_name:
-            types.add(t[2])
-    return list(types)
+    return list(_index.types.get((provider_name, service_name), ()))
 
 
-def find_resource_class(resource_path):
+def register_resource(resource_path, resource_cls):
     """
-    dynamically load a class from a string
+    Add a resource class to those skew can scan, or replace one.
+
+    :type resource_path: str
+    :param resource_path: The provider, service and resource type as
+        they appear in ARNs, separated by dots (e.g. ``aws.ec2.instance``).
+
+    :type resource_cls: class or str
+    :param resource_cls: The resource class, or its full dotted path
+        (e.g. ``mypackage.resources.Widget``) to import it only when it
+        is first needed.
     """
-    class_path = ResourceTypes[resource_path]
-    # First prepend our __name__ to the resource string passed in.
-    full_path = '.'.join([__name__, class_path])
-    class_data = full_path.split(".")
-    module_path = ".".join(class_data[:-1])
-    class_str = class_data[-1]
+    global _index
+    if len(resource_path.split('.', 2)) != 3:
+        raise ValueError('Resource path (%s) must be provider.service.type'
+                         % resource_path)
+    with _lock:
+        _registered[resource_path] = resource_cls
+        _classes.pop(resource_path, None)
+        _index = _build_index()
+
+
+def _import_class(full_path):
+    module_path, class_str = full_path.rsplit('.', 1)
     module = importlib.import_module(module_path)
-    # Finally, we retrieve the Class
     return getattr(module, class_str)
+
+
+def find_resource_class(resource_path):
+    """
+    dynamically load a class from a string
+    """
+    resource_cls = _classes.get(resource_path)
+    if resource_cls is not None:
+        return resource_cls
+    with _lock:
+        resource_cls = _registered.get(resource_path)
+    if resource_cls is None:
+        # Prepend our __name__ to the class path of built in resources.
+        resource_cls = _import_class(
+            '.'.join([__name__, ResourceTypes[resource_path]]))
+    elif not isinstance(resource_cls, type):
+        resource_cls = _import_class(resource_cls)
+    skew.query.precompile(resource_cls)
+    with _lock:
+        _classes[resource_path] = resource_cls
+    return resource_cls
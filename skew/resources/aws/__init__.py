@@ -14,15 +14,176 @@
 
 import logging
 import datetime
-from collections import namedtuple
+import threading
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-import jmespath
+import dateutil.parser
+import dateutil.tz
 
 import skew.awsclient
+import skew.metrics
+import skew.query
+import skew.tagging
 from skew.resources.resource import Resource
 
 LOG = logging.getLogger(__name__)
 
+# The name used for the detail_spec call among the fetches a resource
+# has made.  The attr_spec calls are named after the key they fill in.
+DetailSpec = 'detail_spec'
+
+_NotSet = object()
+
+
+class HydratingDict(dict):
+    """
+    The data of a resource whose details are only fetched when they are
+    first needed.  Looking up a key that is not there yet, whether with
+    ``[]``, ``get``, ``in`` or a jmespath query, asks the resource to
+    fetch whatever provides that key first.  Everything else (e.g.
+    iterating or serializing) only sees what has been fetched so far;
+    use ``hydrate`` to fetch it all up front.
+    """
+
+    def __init__(self, data, loader):
+        super(HydratingDict, self).__init__(data)
+        self._loader = loader
+
+    def __missing__(self, key):
+        self._loader(key)
+        value = dict.get(self, key, _NotSet)
+        if value is _NotSet:
+            raise KeyError(key)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        if dict.__contains__(self, key):
+            return True
+        self._loader(key)
+        return dict.__contains__(self, key)
+
+
+def tags_to_dict(tags):
+    """
+    Convert the ugly Tags JSON (a list of Key/Value pairs) into a real
+    dictionary.  Keys that appear more than once get a list of values.
+    """
+    if isinstance(tags, dict):
+        return tags
+    result = {}
+    for kvpair in tags or []:
+        if kvpair['Key'] in result:
+            if not isinstance(result[kvpair['Key']], list):
+                result[kvpair['Key']] = [result[kvpair['Key']]]
+            result[kvpair['Key']].append(kvpair['Value'])
+        else:
+            result[kvpair['Key']] = kvpair['Value']
+    return result
+
+
+def tag_batches(resources):
+    """
+    Split ``resources`` into the batches ``load_tags`` would fetch the
+    tags of with one call each.  Resources that already have their tags
+    are left out.
+    """
+    groups = OrderedDict()
+    for resource in resources:
+        if resource._tags is not None:
+            continue
+        client = resource._client
+        key = (type(resource), client.region_name, client.account_id)
+        groups.setdefault(key, []).append(resource)
+    for (resource_cls, _, _), group in groups.items():
+        batch_size = resource_cls.tags_batch_size()
+        for i in range(0, len(group), batch_size):
+            yield group[i:i + batch_size]
+
+
+def load_tags(resources):
+    """
+    Fill in the tags of ``resources`` with as few calls as possible.
+    Resources whose ``tags_spec`` operation accepts many resources are
+    grouped by type, region and account and fetched in batches, the
+    rest are fetched one at a time and resources that carry their tags
+    in their data need no calls at all.
+    """
+    for batch in tag_batches(resources):
+        if type(batch[0]).tags_batch_size() > 1:
+            type(batch[0])._load_tags_batch(batch)
+        else:
+            batch[0].tags
+
+
+def hydrate(resources, fields=None, max_workers=8):
+    """
+    Fetch the details of ``resources`` that would otherwise be fetched
+    one at a time as they are first used.  All of the fetches needed
+    are run on a pool of ``max_workers`` threads.
+
+    :type resources: list
+    :param resources: The resources to hydrate.
+
+    :type fields: list of str
+    :param fields: The keys of the data to fill in.  The default is to
+        make every fetch the resources describe.
+
+    :returns: The list of resources.
+    """
+    resources = list(resources)
+    tasks = []
+    for resource in resources:
+        if not isinstance(resource, AWSResource):
+            continue
+        for name in resource._hydration_names(fields):
+            tasks.append((resource, name))
+    if not tasks:
+        return resources
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(r._hydrate, name) for r, name in tasks]
+        for future in futures:
+            future.result()
+    return resources
+
+
+def _numpy():
+    # numpy is an optional dependency, only needed for the array views of
+    # MetricData.
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('MetricData arrays require numpy, '
+                          'install skew[numpy]')
+    return numpy
+
+
+Epoch = datetime.datetime(1970, 1, 1, tzinfo=dateutil.tz.tzutc())
+
+
+def epoch_seconds(timestamp):
+    """
+    Convert a CloudWatch timestamp (a datetime, ISO 8601 string or
+    number of seconds) into seconds since the epoch.
+    """
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if not isinstance(timestamp, datetime.datetime):
+        timestamp = dateutil.parser.parse(timestamp)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=dateutil.tz.tzutc())
+    return (timestamp - Epoch).total_seconds()
+
+
+# The keys of a datapoint that are not statistics.
+DatapointKeys = ('Timestamp', 'Unit')
+
 
 class MetricData(object):
     """
@@ -31,11 +192,139 @@ class MetricData(object):
     was used when getting the data from CloudWatch.  Since the period
     may be calculated by ``get_metrics_data`` rather than passed explicitly
     the user would otherwise not how what the period value was.
+
+    The datapoints in ``data`` are sorted by time.  With numpy installed
+    they can also be used as arrays, one of ``timestamps`` (in seconds
+    since the epoch) and one of ``values`` for each statistic, which
+    ``resample``, ``percentile``, ``rate`` and ``skew.metrics.aggregate``
+    work on without going through the datapoints one at a time.
     """
 
     def __init__(self, data, period):
-        self.data = data
+        self._data = sorted(data or [], key=lambda d: d['Timestamp'])
         self.period = period
+        self._timestamps = None
+        self._columns = None
+
+    @classmethod
+    def from_columns(cls, timestamps, columns, period):
+        """
+        Create a ``MetricData`` from a sorted sequence of ``timestamps``
+        and a dictionary of equally long sequences of values, keyed by
+        statistic.  Missing values are NaN.  The datapoint dictionaries
+        are only built if ``data`` is used.
+        """
+        metric_data = cls([], period)
+        metric_data._data = None
+        metric_data._timestamps = timestamps
+        metric_data._columns = columns
+        return metric_data
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = []
+            for i, timestamp in enumerate(self._timestamps):
+                if not isinstance(timestamp, datetime.datetime):
+                    timestamp = datetime.datetime.fromtimestamp(
+                        float(timestamp), dateutil.tz.tzutc())
+                datapoint = {'Timestamp': timestamp}
+                for statistic, values in self._columns.items():
+                    value = float(values[i])
+                    if value == value:
+                        datapoint[statistic] = value
+                self._data.append(datapoint)
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self._timestamps = None
+        self._columns = None
+
+    @property
+    def statistics(self):
+        """
+        The names of the statistics in the data.
+        """
+        if self._columns is not None:
+            return list(self._columns)
+        names = []
+        for datapoint in self._data:
+            for key in datapoint:
+                if key not in DatapointKeys and key not in names:
+                    names.append(key)
+        return names
+
+    def _arrays(self):
+        np = _numpy()
+        if self._timestamps is None:
+            self._timestamps = [d['Timestamp'] for d in self._data]
+            self._columns = dict(
+                (name, [d.get(name, np.nan) for d in self._data])
+                for name in self.statistics)
+        if not isinstance(self._timestamps, np.ndarray):
+            self._timestamps = np.array(
+                [epoch_seconds(t) for t in self._timestamps],
+                dtype=np.float64)
+        for name, values in self._columns.items():
+            if not isinstance(values, np.ndarray):
+                self._columns[name] = np.asarray(values, dtype=np.float64)
+        return self._timestamps, self._columns
+
+    @property
+    def timestamps(self):
+        """
+        A numpy array of the times of the datapoints, in seconds since
+        the epoch.
+        """
+        return self._arrays()[0]
+
+    def values(self, statistic='Average'):
+        """
+        A numpy array of the values of ``statistic``, with NaN where a
+        datapoint doesn't have it.
+        """
+        return self._arrays()[1][statistic]
+
+    def resample(self, period, how='mean'):
+        """
+        Return a new ``MetricData`` with the datapoints combined into
+        ``period`` seconds.  ``how`` is one of ``mean``, ``sum``, ``max``
+        or ``min``.
+        """
+        np = _numpy()
+        reducers = {'sum': np.add, 'max': np.maximum, 'min': np.minimum,
+                    'mean': np.add}
+        if how not in reducers:
+            raise ValueError('Unknown resample method (%s)' % how)
+        timestamps, columns = self._arrays()
+        buckets = np.floor(timestamps / period) * period
+        starts = np.flatnonzero(np.r_[True, np.diff(buckets) != 0])
+        counts = np.diff(np.r_[starts, len(buckets)])
+        resampled = {}
+        for name, values in columns.items():
+            if not len(values):
+                resampled[name] = values
+                continue
+            result = reducers[how].reduceat(values, starts)
+            if how == 'mean':
+                result = result / counts
+            resampled[name] = result
+        return MetricData.from_columns(buckets[starts], resampled, period)
+
+    def percentile(self, q, statistic='Average'):
+        """
+        The ``q``th percentile of the values of ``statistic``.
+        """
+        return float(_numpy().nanpercentile(self.values(statistic), q))
+
+    def rate(self, statistic='Sum'):
+        """
+        A numpy array of the values of ``statistic`` per second of the
+        period, e.g. bytes per second from the ``Sum`` of a byte count.
+        """
+        return self.values(statistic) / float(self.period)
 
 
 class AWSResource(Resource):
@@ -75,19 +364,169 @@ class AWSResource(Resource):
       details, the parameter name to pass in to identify the desired
       resource and the jmespath filter to apply to the results to get
       the details.
+    * hydrate_detail - If True, the details described by ``detail_spec``
+      are merged into the data of every resource the first time a key
+      that is not in the summary is looked up.
+    * attr_spec - A list of additional calls, each filling in one key of
+      the data the first time that key is looked up.  Each is a tuple
+      consisting of the operation, the parameter name to pass in to
+      identify the resource, the jmespath filter to apply to the results
+      and the key to store them under.
     * id - The name of the field within the resource data that uniquely
       identifies the resource.
     * dimension - The CloudWatch dimension for this resource.  A value
       of None indicates that this resource is not monitored by CloudWatch.
+    * namespace - The CloudWatch namespace of the metrics reported under
+      ``dimension``, if they all share one.  The metrics of the resource
+      are then looked up in an index of the whole namespace, shared by
+      every resource in the account and region, rather than with a
+      ``ListMetrics`` call per resource.
     * filter_name - By default, the enumerator returns all resources of a
       given type.  But you can also tell it to filter the results by
       passing in a list of id's.  This parameter tells it the name of the
       parameter to use to specify this list of id's.
+    * tags_batch_spec - If the ``tags_spec`` operation accepts a list of
+      resources, this describes how to fetch the tags of many resources
+      at once.  It is a tuple consisting of the most resources one call
+      accepts, a jmespath query to find the list of per-resource results
+      in the response and, within each result, the name of the field
+      identifying the resource (its ``tags_spec`` parameter value) and
+      the name of the field holding its tags.
     """
 
     class Meta(object):
         type = 'awsresource'
 
+    @classmethod
+    def enumerate(cls, arn, region, account, resource_id=None, **kwargs):
+        if not getattr(arn, 'tags', None):
+            resources = super(AWSResource, cls).enumerate(
+                arn, region, account, resource_id, **kwargs)
+        else:
+            resources = cls._enumerate_tagged(
+                arn, region, account, resource_id, **kwargs)
+        resources = cls._bulk_hydrate(arn, region, account, resources,
+                                      **kwargs)
+        if getattr(arn, 'load_tags', False):
+            resources = cls._with_tags(resources)
+        return resources
+
+    @classmethod
+    def _bulk_hydrate(cls, arn, region, account, resources, **kwargs):
+        """
+        Resource classes whose details can be fetched for a whole
+        account at once override this to fill them in as the resources
+        are enumerated.
+        """
+        return resources
+
+    @classmethod
+    def _with_tags(cls, resources):
+        """
+        Load the tags of ``resources`` as they are enumerated, holding
+        back just enough of them to fill one batched tag call.
+        """
+        batch_size = cls.tags_batch_size()
+        batch = []
+        for resource in resources:
+            batch.append(resource)
+            if len(batch) >= batch_size:
+                load_tags(batch)
+                for r in batch:
+                    yield r
+                batch = []
+        load_tags(batch)
+        for r in batch:
+            yield r
+
+    @classmethod
+    def tags_batch_size(cls):
+        """
+        The number of resources of this type whose tags can be fetched
+        with one call.
+        """
+        batch_spec = getattr(cls.Meta, 'tags_batch_spec', None)
+        if batch_spec and getattr(cls.Meta, 'tags_spec', None):
+            return batch_spec[0]
+        return 1
+
+    @classmethod
+    def _load_tags_batch(cls, resources):
+        """
+        Fetch the tags of ``resources``, all of this type and from the
+        same client, with a single call.
+        """
+        batch_size, path, id_key, tags_key = cls.Meta.tags_batch_spec
+        method, _, param_name, param_value = cls.Meta.tags_spec[:4]
+        by_id = OrderedDict(
+            (getattr(r, param_value), r) for r in resources)
+        kwargs = {param_name: list(by_id)}
+        if len(cls.Meta.tags_spec) > 4:
+            kwargs.update(cls.Meta.tags_spec[4])
+        LOG.debug('fetching tags for %d resources', len(by_id))
+        results = resources[0]._client.call(method, query=path, **kwargs)
+        for resource in resources:
+            resource.data['Tags'] = []
+        for result in results or []:
+            resource = by_id.get(result.get(id_key))
+            if resource is not None:
+                resource.data['Tags'] = result.get(tags_key) or []
+        for resource in resources:
+            resource._tags = tags_to_dict(resource.data['Tags'])
+
+    @classmethod
+    def _enumerate_tagged(cls, arn, region, account, resource_id=None,
+                          **kwargs):
+        """
+        Enumerate only the resources matching the ``tags`` of the scan.
+        The matches come from the tagging API so types with no matches
+        make no calls at all.  If the enumeration call can be filtered
+        by a list of IDs only the matches are described, otherwise all
+        resources are listed and the rest are dropped.  The tags of
+        each resource come with the match so they never need fetching.
+        """
+        tagged = skew.tagging.tagged_resources(arn, region, account, **kwargs)
+        matches = tagged.for_class(cls)
+        if resource_id and resource_id != '*':
+            matches = dict((k, v) for k, v in matches.items()
+                           if k == resource_id)
+        if not matches:
+            LOG.debug('no %s tagged %s', cls.Meta.type, arn.tags)
+            return
+        client = skew.awsclient.get_awsclient(
+            cls.Meta.service, region, account, **kwargs)
+        filter_name = getattr(cls.Meta, 'filter_name', None)
+        batched = (getattr(cls.Meta, 'filter_type', None) == 'list' and
+                   filter_name == '%ss' % cls.Meta.id)
+        if batched:
+            ids = sorted(matches)
+            chunks = [{filter_name: ids[i:i + skew.tagging.MaxFilterIds]}
+                      for i in range(0, len(ids),
+                                     skew.tagging.MaxFilterIds)]
+            accept = None
+        else:
+            chunks = [{}]
+
+            def accept(d):
+                # Drop what we can before a resource is constructed.
+                # Some types (e.g. SNS topics) are identified by ARN.
+                if isinstance(d, dict) and cls.Meta.id in d:
+                    return d[cls.Meta.id] in matches or \
+                        d[cls.Meta.id] in arns
+                return True
+        arns = set(a for a, _ in matches.values())
+        for params in chunks:
+            for resource in cls._enumerate(arn, client, region, account,
+                                           params, accept, complete=False):
+                match = matches.get(resource.id)
+                if match is None:
+                    if resource.arn not in arns:
+                        continue
+                    match = [m for m in matches.values()
+                             if m[0] == resource.arn][0]
+                resource._tags = tags_to_dict(match[1])
+                yield resource
+
     @classmethod
     def filter(cls, arn, resource_id, data):
         pass
@@ -98,23 +537,104 @@ class AWSResource(Resource):
         if data is None:
             data = {}
         self.data = data
-        if self._query:
-            self.filtered_data = self._query.search(self.data)
-        else:
-            self.filtered_data = None
+        self._filtered_data = _NotSet
         if hasattr(self.Meta, 'id') and isinstance(self.data, dict):
             self._id = self.data.get(self.Meta.id, '')
         else:
             self._id = ''
-        self._cloudwatch = None
-        if hasattr(self.Meta, 'dimension') and self.Meta.dimension:
-            self._cloudwatch = skew.awsclient.get_awsclient(
-                'cloudwatch', self._client.region_name,
-                self._client.account_id)
+        self._cloudwatch_client = None
         self._metrics = None
         self._name = None
         self._date = None
         self._tags = None
+        self._hydrated = set()
+        self._hydrate_locks = {}
+        self._hydrate_lock = threading.Lock()
+        if self._lazy_names():
+            summary = self.data if isinstance(self.data, dict) else {}
+            self.data = HydratingDict(summary, self._hydrate_key)
+
+    @property
+    def filtered_data(self):
+        # The query is applied on first use so that it only causes the
+        # details it actually refers to to be fetched.
+        if self._filtered_data is _NotSet:
+            if self._query:
+                self._filtered_data = self._query.search(self.data)
+            else:
+                self._filtered_data = None
+        return self._filtered_data
+
+    @classmethod
+    def _lazy_names(cls):
+        names = [a[3] for a in getattr(cls.Meta, 'attr_spec', None) or []]
+        if getattr(cls.Meta, 'hydrate_detail', False):
+            names.append(DetailSpec)
+        return names
+
+    def _hydration_names(self, fields=None):
+        """
+        The names of the fetches still needed to fill in ``fields`` (or
+        everything, if ``fields`` is None).
+        """
+        lazy_names = self._lazy_names()
+        if fields is None:
+            names = lazy_names
+        else:
+            names = []
+            for field in fields:
+                if field in lazy_names:
+                    names.append(field)
+                elif DetailSpec in lazy_names and \
+                        not dict.__contains__(self.data, field):
+                    names.append(DetailSpec)
+        return [n for n in OrderedDict.fromkeys(names)
+                if n not in self._hydrated]
+
+    def _hydrate_key(self, key):
+        for name in self._hydration_names([key]):
+            self._hydrate(name)
+
+    def _hydrate(self, name):
+        """
+        Make the fetch called ``name`` unless it has already been made.
+        Different fetches for the same resource can run at once.
+        """
+        with self._hydrate_lock:
+            lock = self._hydrate_locks.setdefault(name, threading.Lock())
+        with lock:
+            if name in self._hydrated:
+                return
+            if name == DetailSpec:
+                self._fetch_detail()
+            else:
+                for attr in self.Meta.attr_spec:
+                    if attr[3] == name:
+                        self._fetch_attr(attr)
+            self._hydrated.add(name)
+
+    def _param_value(self, param_name):
+        return dict.get(self.data, param_name) or self.id
+
+    def _fetch_detail(self):
+        detail_op, param_name, detail_path = self.Meta.detail_spec
+        params = {param_name: self._param_value(param_name)}
+        data = self._client.call(detail_op, **params)
+        data = skew.query.search(detail_path, data)
+        if isinstance(data, dict):
+            dict.update(self.data, data)
+
+    def _fetch_attr(self, attr):
+        LOG.debug(attr)
+        detail_op, param_name, detail_path, detail_key = attr
+        params = {param_name: self._param_value(param_name)}
+        data = self._client.call(detail_op, **params)
+        if detail_path is not None:
+            data = skew.query.search(detail_path, data)
+        if isinstance(data, dict) and 'ResponseMetadata' in data:
+            del data['ResponseMetadata']
+        dict.__setitem__(self.data, detail_key, data)
+        LOG.debug(data)
 
     def __repr__(self):
         return self.arn
@@ -126,15 +646,42 @@ class AWSResource(Resource):
             self._client.region_name,
             self._client.account_id, self.resourcetype, self.id)
 
+    @property
+    def cloudwatch(self):
+        """
+        The CloudWatch client for this resource's account and region, or
+        None if the resource is not monitored by CloudWatch.  The client
+        is only looked up the first time it is needed.
+        """
+        if self._cloudwatch_client is None:
+            if getattr(self.Meta, 'dimension', None):
+                self._cloudwatch_client = skew.awsclient.get_awsclient(
+                    'cloudwatch', self._client.region_name,
+                    self._client.account_id)
+        return self._cloudwatch_client
+
+    def _metric_index(self):
+        # The shared index of this resource's namespace, or None if the
+        # class doesn't declare one.
+        namespace = getattr(self.Meta, 'namespace', None)
+        if namespace and self.cloudwatch:
+            return skew.metrics.metric_index(
+                self._client.account_id, self._client.region_name,
+                namespace)
+        return None
+
     @property
     def metrics(self):
         if self._metrics is None:
-            if self._cloudwatch:
-                data = self._cloudwatch.call(
+            index = self._metric_index()
+            if index is not None:
+                self._metrics = index.metrics(self.Meta.dimension, self._id)
+            elif self.cloudwatch:
+                data = self.cloudwatch.call(
                     'list_metrics',
                     Dimensions=[{'Name': self.Meta.dimension,
                                  'Value': self._id}])
-                self._metrics = jmespath.search('Metrics', data)
+                self._metrics = skew.query.search('Metrics', data)
             else:
                 self._metrics = []
         return self._metrics
@@ -168,20 +715,14 @@ class AWSResource(Resource):
                 LOG.debug(self.data['Tags'])
 
             if 'Tags' in self.data:
-                _tags = self.data['Tags']
-                if isinstance(_tags, list):
-                    for kvpair in _tags:
-                        if kvpair['Key'] in self._tags:
-                            if not isinstance(self._tags[kvpair['Key']], list):
-                                self._tags[kvpair['Key']] = [self._tags[kvpair['Key']]]
-                            self._tags[kvpair['Key']].append(kvpair['Value'])
-                        else:
-                            self._tags[kvpair['Key']] = kvpair['Value']
-                elif isinstance(_tags, dict):
-                    self._tags = _tags
+                self._tags = tags_to_dict(self.data['Tags'])
         return self._tags
 
     def find_metric(self, metric_name):
+        if self._metrics is None:
+            index = self._metric_index()
+            if index is not None:
+                return index.find(self.Meta.dimension, self._id, metric_name)
         for m in self.metrics:
             if m['MetricName'] == metric_name:
                 return m
@@ -196,7 +737,7 @@ class AWSResource(Resource):
 
     def get_metric_data(self, metric_name=None, metric=None,
                         days=None, hours=1, minutes=None,
-                        statistics=None, period=None):
+                        statistics=None, period=None, cache=None):
         """
         Get metric data for this resource.  You can specify the time
         frame for the data as either the number of days or number of
@@ -229,6 +770,10 @@ class AWSResource(Resource):
             * Maximum
             * Minimum
 
+        :type cache: ``skew.metrics.DatapointCache``
+        :param cache: If given, only the datapoints that aren't already
+            in the cache are requested from CloudWatch.
+
         :returns: A ``MetricData`` object that contains both the CloudWatch
             data as well as the ``period`` used since this value may have
             been calculated by skew.
@@ -245,17 +790,20 @@ class AWSResource(Resource):
             period = max(60, self._total_seconds(delta) // 1440)
         if not metric:
             metric = self.find_metric(metric_name)
-        if metric and self._cloudwatch:
+        if metric and self.cloudwatch:
             end = datetime.datetime.utcnow()
             start = end - delta
-            data = self._cloudwatch.call(
+            if cache is not None:
+                return cache.get_metric_data(self.cloudwatch, metric,
+                                             statistics, start, end, period)
+            data = self.cloudwatch.call(
                 'get_metric_statistics',
                 Dimensions=metric['Dimensions'],
                 Namespace=metric['Namespace'],
                 MetricName=metric['MetricName'],
                 StartTime=start.isoformat(), EndTime=end.isoformat(),
                 Statistics=statistics, Period=period)
-            return MetricData(jmespath.search('Datapoints', data),
+            return MetricData(skew.query.search('Datapoints', data),
                               period)
         else:
             raise ValueError('Metric (%s) not available' % metric_name)
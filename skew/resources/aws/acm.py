@@ -14,8 +14,6 @@
 
 import logging
 
-import jmespath
-
 from skew.resources.aws import AWSResource
 
 
@@ -29,6 +27,7 @@ class Certificate(AWSResource):
         type = 'certificate'
         enum_spec = ('list_certificates', 'CertificateSummaryList', None)
         detail_spec = ('describe_certificate', 'CertificateArn', 'Certificate')
+        hydrate_detail = True
         id = 'CertificateArn'
         tags_spec = ('list_tags_for_certificate', 'Tags[]',
                      'CertificateArn', 'id')
@@ -51,9 +50,3 @@ class Certificate(AWSResource):
         super(Certificate, self).__init__(client, data, query)
 
         self._id = data['CertificateArn']
-
-        detail_op, param_name, detail_path = self.Meta.detail_spec
-        params = {param_name: data['CertificateArn']}
-        data = client.call(detail_op, **params)
-
-        self.data = jmespath.search(detail_path, data)
@@ -12,7 +12,7 @@
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
 
-import jmespath
+import skew.query
 
 from skew.resources.aws import AWSResource
 
@@ -31,13 +31,9 @@ class AutoScalingGroup(AWSResource):
         filter_name = 'AutoScalingGroupNames'
         filter_type = 'list'
 
-    def __init__(self, client, data, query=None):
-        super(AutoScalingGroup, self).__init__(client, data, query)
-        self._arn_query = jmespath.compile('AutoScalingGroupARN')
-
     @property
     def arn(self):
-        return self._arn_query.search(self.data)
+        return skew.query.search('AutoScalingGroupARN', self.data)
 
 
 class LaunchConfiguration(AWSResource):
@@ -55,10 +51,6 @@ class LaunchConfiguration(AWSResource):
         filter_name = 'LaunchConfigurationNames'
         filter_type = 'list'
 
-    def __init__(self, client, data, query=None):
-        super(LaunchConfiguration, self).__init__(client, data, query)
-        self._arn_query = jmespath.compile('LaunchConfigurationARN')
-
     @property
     def arn(self):
-        return self._arn_query.search(self.data)
+        return skew.query.search('LaunchConfigurationARN', self.data)
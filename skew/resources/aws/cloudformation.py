@@ -10,37 +10,61 @@
 # distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
-import jmespath
+import collections
+import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from skew.resources.aws import AWSResource
 
+LOG = logging.getLogger(__name__)
+
 
 class Stack(AWSResource):
 
+    # The most stacks whose resources are listed at once by each unit of
+    # a scan.  It doesn't follow ``max_workers`` since the units may
+    # already be running in parallel.
+    resource_workers = 8
+
     @classmethod
     def enumerate(cls, arn, region, account, resource_id=None, **kwargs):
         resources = super(Stack, cls).enumerate(arn, region, account,
                                                 resource_id, **kwargs)
-        for stack in resources:
-            stack.data['Resources'] = []
-            for stack_resource in stack:
-                resource_id = stack_resource.get('PhysicalResourceId')
-                if not resource_id:
-                    resource_id = stack_resource.get('LogicalResourceId')
-                stack.data['Resources'].append(
-                    {
-                        'id': resource_id,
-                        'type': stack_resource['ResourceType']
-                    }
-                )
-        return resources
+        if getattr(arn, 'lazy_stack_resources', False):
+            return resources
+        return cls._with_resources(resources, cls.resource_workers)
+
+    @classmethod
+    def _with_resources(cls, stacks, max_workers):
+        """
+        List the resources of ``stacks`` on a pool of ``max_workers``
+        threads, yielding the stacks in order as they are done.  Only a
+        few stacks more than there are workers are held back at once.
+        """
+        pending = collections.deque()
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for stack in stacks:
+                pending.append(
+                    (stack, pool.submit(stack._hydrate, 'Resources')))
+                if len(pending) >= 2 * max_workers:
+                    stack, future = pending.popleft()
+                    future.result()
+                    yield stack
+            while pending:
+                stack, future = pending.popleft()
+                future.result()
+                yield stack
 
     class Meta(object):
         service = 'cloudformation'
         type = 'stack'
         enum_spec = ('describe_stacks', 'Stacks[]', None)
-        detail_spec = ('describe_stack_resources', 'StackName',
-                       'StackResources[]')
+        detail_spec = ('list_stack_resources', 'StackName',
+                       'StackResourceSummaries')
+        attr_spec = [
+            ('list_stack_resources', 'StackName',
+             'StackResourceSummaries', 'Resources'),
+        ]
         id = 'StackName'
         filter_name = 'StackName'
         name = 'StackName'
@@ -50,16 +74,34 @@ class Stack(AWSResource):
     def __init__(self, client, data, query=None):
         super(Stack, self).__init__(client, data, query)
         self._data = data
-        self._resources = []
+        self._resources = None
 
     def __iter__(self):
+        if self._resources is not None:
+            for resource in self._resources:
+                yield resource
+            return
+        # Stream the pages, remembering them for the next time.
         detail_op, param_name, detail_path = self.Meta.detail_spec
         params = {param_name: self.id}
-        if not self._resources:
-            data = self._client.call(detail_op, **params)
-            self._resources = jmespath.search(detail_path, data)
-        for resource in self._resources:
+        resources = []
+        for resource in self._client.iter_call(detail_op, query=detail_path,
+                                               **params):
+            resources.append(resource)
             yield resource
+        self._resources = resources
+
+    def _fetch_attr(self, attr):
+        if attr[3] != 'Resources':
+            return super(Stack, self)._fetch_attr(attr)
+        resources = []
+        for stack_resource in self:
+            resource_id = stack_resource.get('PhysicalResourceId')
+            if not resource_id:
+                resource_id = stack_resource.get('LogicalResourceId')
+            resources.append({'id': resource_id,
+                              'type': stack_resource['ResourceType']})
+        dict.__setitem__(self.data, 'Resources', resources)
 
     @property
     def arn(self):
@@ -11,7 +11,6 @@
 # distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
-import jmespath
 import logging
 from skew.resources.aws import AWSResource
 
@@ -29,6 +28,7 @@ class CloudTrail(AWSResource):
         id = 'Name'
         tags_spec = ('list_tags', 'ResourceTagList[].TagsList[]',
                      'ResourceIdList', 'name')
+        tags_batch_spec = (20, 'ResourceTagList', 'ResourceId', 'TagsList')
         filter_name = 'trailNameList'
         filter_type = 'arn'
         name = 'TrailARN'
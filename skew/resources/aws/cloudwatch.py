@@ -11,7 +11,6 @@
 # distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
-import jmespath
 import logging
 from skew.resources.aws import AWSResource
 
@@ -74,19 +73,6 @@ class LogGroup(AWSResource):
         self._keys = []
         self._id = data['logGroupName']
 
-        # add addition attribute data
-        for attr in self.Meta.attr_spec:
-            LOG.debug(attr)
-            detail_op, param_name, detail_path, detail_key = attr
-            params = {param_name: self._id}
-            data = self._client.call(detail_op, **params)
-            if not (detail_path is None):
-                data = jmespath.search(detail_path, data)
-            if 'ResponseMetadata' in data:
-                del data['ResponseMetadata']
-            self.data[detail_key] = data
-            LOG.debug(data)
-
     @property
     def logGroupName(self):
         return self.data.get('logGroupName')
@@ -14,8 +14,6 @@
 
 import logging
 
-import jmespath
-
 from skew.resources.aws import AWSResource
 
 
@@ -29,6 +27,7 @@ class Table(AWSResource):
         type = 'table'
         enum_spec = ('list_tables', 'TableNames', None)
         detail_spec = ('describe_table', 'TableName', 'Table')
+        hydrate_detail = True
         id = 'Table'
         tags_spec = ('list_tags_of_resource', 'Tags[]',
                      'ResourceArn', 'arn')
@@ -36,6 +35,7 @@ class Table(AWSResource):
         name = 'TableName'
         date = 'CreationDateTime'
         dimension = 'TableName'
+        namespace = 'AWS/DynamoDB'
 
     @classmethod
     def filter(cls, arn, resource_id, data):
@@ -45,7 +45,3 @@ class Table(AWSResource):
     def __init__(self, client, data, query=None):
         super(Table, self).__init__(client, data, query)
         self._id = data
-        detail_op, param_name, detail_path = self.Meta.detail_spec
-        params = {param_name: self.id}
-        data = client.call(detail_op, **params)
-        self.data = jmespath.search(detail_path, data)
@@ -28,6 +28,7 @@ class Instance(AWSResource):
         name = 'PublicDnsName'
         date = 'LaunchTime'
         dimension = 'InstanceId'
+        namespace = 'AWS/EC2'
 
     @property
     def parent(self):
@@ -91,6 +92,7 @@ class Volume(AWSResource):
         name = 'VolumeId'
         date = 'createTime'
         dimension = 'VolumeId'
+        namespace = 'AWS/EBS'
 
     @property
     def parent(self):
@@ -31,6 +31,7 @@ class Cluster(AWSResource):
         name = 'CacheClusterId'
         date = 'CacheClusterCreateTime'
         dimension = 'CacheClusterId'
+        namespace = 'AWS/ElastiCache'
 
     @property
     def arn(self):
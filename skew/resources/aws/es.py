@@ -12,8 +12,6 @@
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
 
-import jmespath
-
 from skew.resources.aws import AWSResource
 
 
@@ -26,6 +24,7 @@ class ElasticsearchDomain(AWSResource):
         tags_spec = ('list_tags', 'TagList',
                      'ARN', 'arn')
         detail_spec = ('describe_elasticsearch_domain', 'DomainName', 'DomainStatus')
+        hydrate_detail = True
         id = 'DomainName'
         filter_name = None
         name = 'DomainName'
@@ -35,7 +34,3 @@ class ElasticsearchDomain(AWSResource):
     def __init__(self, client, data, query=None):
         super(ElasticsearchDomain, self).__init__(client, data, query)
         self._id = data
-        detail_op, param_name, detail_path = self.Meta.detail_spec
-        params = {param_name: self.id}
-        data = client.call(detail_op, **params)
-        self.data = jmespath.search(detail_path, data)
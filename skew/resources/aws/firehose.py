@@ -11,7 +11,6 @@
 
 from skew.resources.aws import AWSResource
 
-import jmespath
 
 class DeliveryStream(AWSResource):
 
@@ -20,18 +19,16 @@ class DeliveryStream(AWSResource):
         type = 'deliverystream'
         enum_spec = ('list_delivery_streams', 'DeliveryStreamNames', None)
         detail_spec = ('describe_delivery_stream', 'DeliveryStreamName', 'DeliveryStreamDescription')
+        hydrate_detail = True
         id = 'DeliveryStreamName'
         filter_name = None
         filter_type = None
         name = 'DeliveryStreamName'
         date = 'CreateTimestamp'
         dimension = 'DeliveryStreamName'
+        namespace = 'AWS/Firehose'
         tags_spec = ('list_tags_for_delivery_stream', 'Tags[]', 'DeliveryStreamName', 'id')
 
     def __init__(self, client, data, query=None):
         super(DeliveryStream, self).__init__(client, data, query)
         self._id = data
-        detail_op, param_name, detail_path = self.Meta.detail_spec
-        params = {param_name: self.id}
-        data = client.call(detail_op, **params)
-        self.data = jmespath.search(detail_path, data)
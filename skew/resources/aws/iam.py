@@ -13,23 +13,113 @@
 # language governing permissions and limitations under the License.
 
 import logging
-import jmespath
-from skew.resources.aws import AWSResource
+
+from botocore.exceptions import ClientError
+
+import skew.awsclient
+import skew.query
+from skew.resources.aws import AWSResource, tags_to_dict
 
 LOG = logging.getLogger(__name__)
 
+# The entity types fetched by get_account_authorization_details.  AWS
+# managed policies are left out since there are so many of them.
+AuthorizationDetailsFilter = ['User', 'Role', 'Group', 'LocalManagedPolicy']
+
+
+class AuthorizationDetails(object):
+    """
+    The users, roles, groups and local managed policies of an account
+    as returned by ``get_account_authorization_details``, indexed by
+    the name of the list they came from and then by name (or ARN, for
+    policies).
+    """
+
+    Keys = {
+        'UserDetailList': 'UserName',
+        'RoleDetailList': 'RoleName',
+        'GroupDetailList': 'GroupName',
+        'Policies': 'Arn',
+    }
+
+    def __init__(self, data):
+        self._index = {}
+        for list_name, key in self.Keys.items():
+            self._index[list_name] = dict(
+                (d[key], d) for d in data.get(list_name) or [])
+
+    def get(self, list_name, key):
+        return self._index[list_name].get(key)
+
+
+def authorization_details(arn, account, **kwargs):
+    """
+    Return the ``AuthorizationDetails`` of ``account``, fetched once per
+    scan, or None if they can't be fetched (e.g. the caller is not
+    allowed to call ``get_account_authorization_details``).
+    """
+    def fetch():
+        client = skew.awsclient.get_awsclient('iam', '', account, **kwargs)
+        try:
+            data = client.call('get_account_authorization_details',
+                               Filter=AuthorizationDetailsFilter)
+        except ClientError as e:
+            LOG.warning('falling back to per-resource IAM calls: %s', e)
+            return None
+        return AuthorizationDetails(data)
+
+    return arn.memo(('iam-authorization-details', account), fetch)
+
 
 class IAMResource(AWSResource):
 
+    # The list in the authorization details this type is found in and
+    # the field of the resource data used to look it up.
+    _details_list = None
+    _details_key = None
+
     @property
     def arn(self):
         return 'arn:aws:%s::%s:%s/%s' % (
             self._client.service_name,
             self._client.account_id, self.resourcetype, self.name)
 
+    @classmethod
+    def _bulk_hydrate(cls, arn, region, account, resources, **kwargs):
+        if cls._details_list is None or \
+                not getattr(arn, 'iam_bulk', False):
+            return resources
+        return cls._with_details(arn, account, resources, **kwargs)
+
+    @classmethod
+    def _with_details(cls, arn, account, resources, **kwargs):
+        details = authorization_details(arn, account, **kwargs)
+        for resource in resources:
+            if details is not None:
+                entry = details.get(
+                    cls._details_list,
+                    dict.get(resource.data, cls._details_key))
+                if entry is not None:
+                    resource._apply_details(entry, details)
+            yield resource
+
+    def _apply_details(self, entry, details):
+        """
+        Fill in the data of this resource from its ``entry`` in the
+        account's authorization details.
+        """
+        for key, value in entry.items():
+            if key == 'Tags':
+                self._tags = tags_to_dict(value)
+            if not dict.__contains__(self.data, key):
+                self.data[key] = value
+
 
 class Group(IAMResource):
 
+    _details_list = 'GroupDetailList'
+    _details_key = 'GroupName'
+
     class Meta(object):
         service = 'iam'
         type = 'group'
@@ -49,11 +139,15 @@ class Group(IAMResource):
 
 class User(IAMResource):
 
+    _details_list = 'UserDetailList'
+    _details_key = 'UserName'
+
     class Meta(object):
         service = 'iam'
         type = 'user'
         enum_spec = ('list_users', 'Users', None)
         detail_spec = ('get_user', 'UserName', 'User')
+        hydrate_detail = True
         attr_spec = [
             ('list_access_keys', 'UserName',
                 'AccessKeyMetadata', 'AccessKeyMetadata'),
@@ -75,45 +169,45 @@ class User(IAMResource):
         tags_spec = ('list_user_tags', 'Tags[]',
                      'UserName', 'name')
 
-    def __init__(self, client, data, query=None):
-        super(User, self).__init__(client, data, query)
-
-        LOG.debug(data)
-        # add details
-        if self.Meta.detail_spec is not None:
-            detail_op, param_name, detail_path = self.Meta.detail_spec
-            params = {param_name: self.data[param_name]}
-            data = client.call(detail_op, **params)
-            self.data = jmespath.search(detail_path, data)
-
-        # add attribute data
-        if self.Meta.attr_spec is not None:
-            for attr in self.Meta.attr_spec:
-                LOG.debug(attr)
-                LOG.debug(data)
-                detail_op, param_name, detail_path, detail_key = attr
-                params = {param_name: self.data[param_name]}
-                tmp_data = self._client.call(detail_op, **params)
-                if not (detail_path is None):
-                    tmp_data = jmespath.search(detail_path, tmp_data)
-                if 'ResponseMetadata' in tmp_data:
-                    del tmp_data['ResponseMetadata']
-                self.data[detail_key] = tmp_data
-                LOG.debug(data)
-
-            # retrieve all of the inline IAM policies
-            if 'PolicyNames' in self.data \
-                and self.data['PolicyNames']:
-                tmp_dict = {}
-                for policy_name in self.data['PolicyNames']:
-                    params = {
-                        'UserName': self.data['UserName'],
-                        'PolicyName': policy_name
-                    }
-                    tmp_data = self._client.call('get_user_policy', **params)
-                    tmp_data = jmespath.search('PolicyDocument', tmp_data)
-                    tmp_dict[policy_name] = tmp_data
-                self.data['PolicyNames'] = tmp_dict
+    def _apply_details(self, entry, details):
+        # Fill in the keys the attr_spec calls would have, in the same
+        # shape.  Access keys and SSH keys aren't in the authorization
+        # details so they are still fetched on first use.
+        groups = []
+        for group_name in entry.get('GroupList') or []:
+            group = details.get('GroupDetailList', group_name) or {}
+            groups.append(dict(
+                (k, v) for k, v in group.items()
+                if k in ('Path', 'GroupName', 'GroupId', 'Arn',
+                         'CreateDate')) or {'GroupName': group_name})
+        self.data['Groups'] = groups
+        self.data['PolicyNames'] = dict(
+            (p['PolicyName'], p['PolicyDocument'])
+            for p in entry.get('UserPolicyList') or [])
+        self.data['AttachedPolicies'] = entry.get(
+            'AttachedManagedPolicies') or []
+        self._hydrated.update(['Groups', 'PolicyNames', 'AttachedPolicies'])
+        for key in ('Path', 'UserName', 'UserId', 'Arn', 'CreateDate',
+                    'PermissionsBoundary', 'Tags'):
+            if key in entry and not dict.__contains__(self.data, key):
+                self.data[key] = entry[key]
+        if 'Tags' in entry:
+            self._tags = tags_to_dict(entry['Tags'])
+
+    def _fetch_attr(self, attr):
+        super(User, self)._fetch_attr(attr)
+        # retrieve all of the inline IAM policies
+        if attr[3] == 'PolicyNames' and self.data['PolicyNames']:
+            tmp_dict = {}
+            for policy_name in self.data['PolicyNames']:
+                params = {
+                    'UserName': self.data['UserName'],
+                    'PolicyName': policy_name
+                }
+                tmp_data = self._client.call('get_user_policy', **params)
+                tmp_data = skew.query.search('PolicyDocument', tmp_data)
+                tmp_dict[policy_name] = tmp_data
+            self.data['PolicyNames'] = tmp_dict
 
     @classmethod
     def filter(cls, arn, resource_id, data):
@@ -123,6 +217,9 @@ class User(IAMResource):
 
 class Role(IAMResource):
 
+    _details_list = 'RoleDetailList'
+    _details_key = 'RoleName'
+
     class Meta(object):
         service = 'iam'
         type = 'role'
@@ -162,6 +259,9 @@ class InstanceProfile(IAMResource):
 
 class Policy(IAMResource):
 
+    _details_list = 'Policies'
+    _details_key = 'Arn'
+
     class Meta(object):
         service = 'iam'
         type = 'policy'
@@ -28,6 +28,7 @@ class Stream(AWSResource):
         name = 'StreamName'
         date = None
         dimension = 'StreamName'
+        namespace = 'AWS/Kinesis'
         tags_spec = ('list_tags_for_stream', 'Tags[]',
                      'StreamName', 'id')
 
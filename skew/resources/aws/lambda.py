@@ -14,25 +14,69 @@
 
 import logging
 
+import skew.awsclient
 from skew.resources.aws import AWSResource
 
 
 LOG = logging.getLogger(__name__)
 
 
+def event_sources(arn, region, account, **kwargs):
+    """
+    Return a dictionary mapping the ARN of each function in ``region``
+    and ``account`` to the ARNs of its event sources, from one paginated
+    ``ListEventSourceMappings`` call shared by the whole scan.
+    """
+
+    def lookup():
+        client = skew.awsclient.get_awsclient(
+            'lambda', region, account, **kwargs)
+        sources = {}
+        for esm in client.iter_call('list_event_source_mappings',
+                                    query='EventSourceMappings'):
+            sources.setdefault(esm['FunctionArn'], []).append(
+                esm['EventSourceArn'])
+        LOG.debug('event sources of %d functions in %s/%s',
+                  len(sources), region, account)
+        return sources
+
+    return arn.memo(('lambda-event-sources', region, account), lookup)
+
+
 class Function(AWSResource):
 
     @classmethod
     def enumerate(cls, arn, region, account, resource_id=None, **kwargs):
         resources = super(Function, cls).enumerate(arn, region, account,
                                                    resource_id, **kwargs)
+        if resource_id and resource_id != '*':
+            return cls._with_function_sources(resources)
+        return cls._with_region_sources(arn, region, account, resources,
+                                        **kwargs)
+
+    @classmethod
+    def _with_function_sources(cls, resources):
+        # A single function only needs its own event source mappings.
         for r in resources:
             r.data['EventSources'] = []
             kwargs = {'FunctionName': r.data['FunctionName']}
             response = r._client.call('list_event_source_mappings', **kwargs)
             for esm in response['EventSourceMappings']:
                 r.data['EventSources'].append(esm['EventSourceArn'])
-        return resources
+            yield r
+
+    @classmethod
+    def _with_region_sources(cls, arn, region, account, resources,
+                             **kwargs):
+        # The mappings of every function in the region are listed once,
+        # when the first function is found, and joined by function ARN.
+        sources = None
+        for r in resources:
+            if sources is None:
+                sources = event_sources(arn, region, account, **kwargs)
+            r.data['EventSources'] = list(
+                sources.get(r.data['FunctionArn'], []))
+            yield r
 
     class Meta(object):
         service = 'lambda'
@@ -44,6 +88,7 @@ class Function(AWSResource):
         name = 'FunctionName'
         date = 'LastModified'
         dimension = 'FunctionName'
+        namespace = 'AWS/Lambda'
         tags_spec = ('list_tags', 'Tags',
                      'Resource', 'arn')
 
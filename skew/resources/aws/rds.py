@@ -30,6 +30,7 @@ class DBInstance(AWSResource):
         name = 'Endpoint.Address'
         date = 'InstanceCreateTime'
         dimension = 'DBInstanceIdentifier'
+        namespace = 'AWS/RDS'
 
     @property
     def arn(self):
@@ -28,3 +28,4 @@ class Cluster(AWSResource):
         name = 'ClusterIdentifier'
         date = 'ClusterCreateTime'
         dimension = 'ClusterIdentifier'
+        namespace = 'AWS/Redshift'
@@ -10,47 +10,113 @@
 # distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
 # ANY KIND, either express or implied. See the License for the specific
 # language governing permissions and limitations under the License.
-import jmespath
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from skew.resources.aws import AWSResource
 
 LOG = logging.getLogger(__name__)
 
+_ShardDone = object()
+
+
+class _ShardFailure(object):
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+class LocationCache(object):
+    """
+    A thread-safe cache of bucket locations.  Entries expire after
+    ``ttl`` seconds.  When the scan has a ``ResponseCache`` the
+    ``get_bucket_location`` responses are kept there as well, so
+    locations also survive from one process to the next.
+    """
+
+    def __init__(self, ttl=24 * 60 * 60):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, bucket_name):
+        with self._lock:
+            entry = self._entries.get(bucket_name)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[bucket_name]
+                return None
+            return entry[1]
+
+    def put(self, bucket_name, location):
+        with self._lock:
+            self._entries[bucket_name] = (time.time() + self.ttl, location)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
 
 class Bucket(AWSResource):
 
-    _location_cache = {}
+    _location_cache = LocationCache()
+
+    # The number of get_bucket_location calls made at once.
+    location_workers = 16
 
     @classmethod
-    def enumerate(cls, arn, region, account, resource_id=None, **kwargs):
-        resources = super(Bucket, cls).enumerate(arn, region, account,
-                                                 resource_id,
-                                                 **kwargs)
-        region_resources = []
-        if region is None:
+    def _enumerate_items(cls, arn, client, region, account, params):
+        # Buckets are listed (and located) once per account, however
+        # many regions are being scanned, and each region takes its own.
+        if not region:
             region = 'us-east-1'
-        for r in resources:
-            location = cls._location_cache.get(r.id)
-            if location is None:
-                LOG.debug('finding location for %s', r.id)
-                kwargs = {'Bucket': r.id}
-                response = r._client.call('get_bucket_location', **kwargs)
-                location = response.get('LocationConstraint', 'us-east-1')
-                if location is None:
-                    location = 'us-east-1'
-                if location is 'EU':
-                    location = 'eu-west-1'
-                cls._location_cache[r.id] = location
+        buckets = arn.memo(('s3-buckets', account),
+                           lambda: cls._located_buckets(client))
+        for data, location in buckets:
             if location == region:
-                region_resources.append(r)
-        return region_resources
+                yield data
+
+    @classmethod
+    def _located_buckets(cls, client):
+        """
+        Return a list of the data and location of every bucket in the
+        account of ``client``.  S3 answers both calls from any region.
+        """
+        enum_op, path, _ = cls.Meta.enum_spec
+        buckets = list(client.iter_call(enum_op, query=path))
+        names = [b[cls.Meta.id] for b in buckets]
+        locations = dict((n, cls._location_cache.get(n)) for n in names)
+        missing = [n for n, loc in locations.items() if loc is None]
+        if missing:
+            LOG.debug('finding locations for %d buckets', len(missing))
+            workers = min(cls.location_workers, len(missing))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                found = pool.map(
+                    lambda n: cls._find_location(client, n), missing)
+                for name, location in zip(missing, found):
+                    locations[name] = location
+        return [(b, locations[b[cls.Meta.id]]) for b in buckets]
+
+    @classmethod
+    def _find_location(cls, client, bucket_name):
+        response = client.call('get_bucket_location', Bucket=bucket_name)
+        location = response.get('LocationConstraint')
+        if not location:
+            location = 'us-east-1'
+        elif location == 'EU':
+            location = 'eu-west-1'
+        cls._location_cache.put(bucket_name, location)
+        return location
 
     class Meta(object):
         service = 's3'
         type = 'bucket'
         enum_spec = ('list_buckets', 'Buckets[]', None)
-        detail_spec = ('list_objects', 'Bucket', 'Contents[]')
+        detail_spec = ('list_objects_v2', 'Bucket', 'Contents[]')
         id = 'Name'
         filter_name = None
         name = 'BucketName'
@@ -62,13 +128,103 @@ class Bucket(AWSResource):
     def __init__(self, client, data, query=None):
         super(Bucket, self).__init__(client, data, query)
         self._data = data
-        self._keys = []
 
     def __iter__(self):
+        return self.iter_objects()
+
+    def iter_objects(self, prefix=None, parallel=False, max_workers=8,
+                     max_buffered=1000, delimiter='/'):
+        """
+        Yield the data of each object in the bucket as each page of the
+        listing arrives.  No keys are kept once they have been yielded.
+
+        :type prefix: str
+        :param prefix: Only list the objects whose keys start with this.
+
+        :type parallel: bool
+        :param parallel: If True, the keyspace is split on ``delimiter``
+            into the prefixes one level below ``prefix`` and these are
+            listed at the same time.  Objects are then yielded in no
+            particular order.
+
+        :type max_workers: int
+        :param max_workers: The number of prefixes listed at once in
+            parallel mode.
+
+        :type max_buffered: int
+        :param max_buffered: The most objects held waiting to be yielded
+            in parallel mode.  Listing pauses while the buffer is full.
+
+        :type delimiter: str
+        :param delimiter: The character the keyspace is split on in
+            parallel mode.
+        """
+        if parallel:
+            return self._iter_objects_parallel(
+                prefix or '', max_workers, max_buffered, delimiter)
+        return self._iter_objects(prefix)
+
+    def _iter_objects(self, prefix=None, **kwargs):
         detail_op, param_name, detail_path = self.Meta.detail_spec
         params = {param_name: self.id}
-        if not self._keys:
-            data = self._client.call(detail_op, **params)
-            self._keys = jmespath.search(detail_path, data)
-        for key in self._keys:
-            yield key
+        if prefix:
+            params['Prefix'] = prefix
+        params.update(kwargs)
+        return self._client.iter_call(detail_op, query=detail_path, **params)
+
+    def _iter_objects_parallel(self, prefix, max_workers, max_buffered,
+                               delimiter):
+        # Objects directly under the prefix are yielded right away and
+        # every common prefix becomes a shard listed on the pool.
+        detail_op, param_name, _ = self.Meta.detail_spec
+        shards = []
+        pages = self._client.iter_call(
+            detail_op, **{param_name: self.id, 'Prefix': prefix,
+                          'Delimiter': delimiter})
+        for page in pages:
+            for item in page.get('Contents') or []:
+                yield item
+            for common_prefix in page.get('CommonPrefixes') or []:
+                shards.append(common_prefix['Prefix'])
+        if not shards:
+            return
+        LOG.debug('listing %d prefixes of %s', len(shards), self.id)
+        buffered = queue.Queue(maxsize=max_buffered)
+        stop = threading.Event()
+
+        def put(item):
+            # Give up rather than block forever if the consumer has gone.
+            while not stop.is_set():
+                try:
+                    buffered.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def list_shard(shard):
+            try:
+                for item in self._iter_objects(shard):
+                    if not put(item):
+                        return
+            except Exception as e:
+                put(_ShardFailure(e))
+            finally:
+                put(_ShardDone)
+
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            for shard in shards:
+                pool.submit(list_shard, shard)
+            remaining = len(shards)
+            while remaining:
+                item = buffered.get()
+                if item is _ShardDone:
+                    remaining -= 1
+                elif isinstance(item, _ShardFailure):
+                    raise item.exception
+                else:
+                    yield item
+        finally:
+            stop.set()
+            pool.shutdown(wait=False)
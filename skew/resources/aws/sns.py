@@ -11,9 +11,7 @@
 
 import logging
 
-import jmespath
-
-from skew.resources.aws import AWSResource
+from skew.resources.aws import AWSResource, DetailSpec
 
 LOG = logging.getLogger(__name__)
 
@@ -25,12 +23,14 @@ class Topic(AWSResource):
         type = 'topic'
         enum_spec = ('list_topics', 'Topics', None)
         detail_spec = ('get_topic_attributes', 'TopicArn', 'Attributes')
+        hydrate_detail = True
         id = 'TopicArn'
         filter_name = None
         filter_type = None
         name = 'DisplayName'
         date = None
         dimension = 'TopicName'
+        namespace = 'AWS/SNS'
         tags_spec = ('list_tags_for_resource', 'Tags[]', 'ResourceArn', 'arn')
 
     @classmethod
@@ -48,12 +48,6 @@ class Topic(AWSResource):
 
         self._id = data['TopicArn'].split(':', 5)[5]
 
-        detail_op, param_name, detail_path = self.Meta.detail_spec
-        params = {param_name: data['TopicArn']}
-        data = client.call(detail_op, **params)
-
-        self.data = jmespath.search(detail_path, data)
-
 
 class Subscription(AWSResource):
 
@@ -65,6 +59,7 @@ class Subscription(AWSResource):
         enum_spec = ('list_subscriptions', 'Subscriptions', None)
         detail_spec = ('get_subscription_attributes', 'SubscriptionArn',
                        'Attributes')
+        hydrate_detail = True
         id = 'SubscriptionArn'
         filter_name = None
         filter_type = None
@@ -81,20 +76,18 @@ class Subscription(AWSResource):
         resources = super(Subscription, cls).enumerate(
             arn, region, account, resource_id, **kwargs)
 
-        return [r for r in resources if r.id not in cls.invalid_arns]
+        for r in resources:
+            if r.id not in cls.invalid_arns:
+                yield r
 
     def __init__(self, client, data, query=None):
         super(Subscription, self).__init__(client, data, query)
 
         if data['SubscriptionArn'] in self.invalid_arns:
             self._id = 'PendingConfirmation'
+            # there are no details to fetch
+            self._hydrated.add(DetailSpec)
             return
 
         self._id = data['SubscriptionArn'].split(':', 6)[6]
         self._name = ""
-
-        detail_op, param_name, detail_path = self.Meta.detail_spec
-        params = {param_name: data['SubscriptionArn']}
-        data = client.call(detail_op, **params)
-
-        self.data = jmespath.search(detail_path, data)
@@ -13,9 +13,9 @@
 # language governing permissions and limitations under the License.
 
 import logging
-import jmespath
 
 import skew.awsclient
+import skew.query
 
 from botocore.exceptions import ClientError
 
@@ -28,8 +28,8 @@ class Resource(object):
     def enumerate(cls, arn, region, account, resource_id=None, **kwargs):
         client = skew.awsclient.get_awsclient(
             cls.Meta.service, region, account, **kwargs)
-        kwargs = {}
-        do_client_side_filtering = False
+        params = {}
+        accept = None
         if resource_id and resource_id != '*':
             # If we are looking for a specific resource and the
             # API provides a way to filter on a specific resource
@@ -39,38 +39,78 @@ class Resource(object):
             filter_name = cls.Meta.filter_name
             if filter_name:
                 if cls.Meta.filter_type == 'arn':
-                    kwargs[filter_name] = [str(arn)]
+                    params[filter_name] = [str(arn)]
                 elif cls.Meta.filter_type == 'list':
-                    kwargs[filter_name] = [resource_id]
+                    params[filter_name] = [resource_id]
                 else:
-                    kwargs[filter_name] = resource_id
+                    params[filter_name] = resource_id
             else:
-                do_client_side_filtering = True
+                # If the API does not support filtering, the resource
+                # class should provide a filter method that will
+                # return True if the returned data matches the
+                # resource ID we are looking for.
+                def accept(d):
+                    return cls.filter(arn, resource_id, d)
+        complete = not (resource_id and resource_id != '*')
+        return cls._enumerate(arn, client, region, account, params, accept,
+                              complete)
+
+    @classmethod
+    def _enumerate(cls, arn, client, region, account, params,
+                   accept=None, complete=True):
+        """
+        Make the enumeration call with ``params`` and yield a resource
+        for each item returned that ``accept`` (if given) returns True
+        for.  ``complete`` says whether every resource of this type in
+        the region and account is being asked for.
+        """
+        # When the scan is incremental, resources whose summary has not
+        # changed since the previous snapshot are skipped before they
+        # are constructed, so none of their follow-up calls are made.
+        tracker = getattr(arn, 'snapshot_tracker', None)
+        if tracker is not None and complete:
+            tracker.scanned(cls, region, account)
+        # Resources are yielded page by page as they arrive.  Only errors
+        # raised while fetching pages are handled here, errors raised
+        # while constructing a resource are passed on to the caller.
+        items = cls._enumerate_items(arn, client, region, account, params)
+        while True:
+            try:
+                d = next(items)
+            except StopIteration:
+                break
+            except ClientError as e:
+                LOG.debug(e)
+                # if the error is because the resource was not found,
+                # be quiet
+                if 'NotFound' not in e.response['Error']['Code']:
+                    raise
+                break
+            LOG.debug(d)
+            if accept is not None and not accept(d):
+                continue
+            if tracker is None:
+                yield cls(client, d, arn.query)
+                continue
+            state = tracker.observe(cls, region, account, d)
+            if state is None:
+                continue
+            resource = cls(client, d, arn.query)
+            resource._snapshot_state = state
+            yield resource
+
+    @classmethod
+    def _enumerate_items(cls, arn, client, region, account, params):
+        """
+        Yield the data of each resource returned by the enumeration
+        call made with ``params``.
+        """
         enum_op, path, extra_args = cls.Meta.enum_spec
+        kwargs = dict(params)
         if extra_args:
             kwargs.update(extra_args)
         LOG.debug('enum_spec=%s' % str(cls.Meta.enum_spec))
-        try:
-            data = client.call(enum_op, query=path, **kwargs)
-        except ClientError as e:
-            LOG.debug(e)
-            data = {}
-            # if the error is because the resource was not found, be quiet
-            if 'NotFound' not in e.response['Error']['Code']:
-                raise
-        LOG.debug(data)
-        resources = []
-        if data:
-            for d in data:
-                if do_client_side_filtering:
-                    # If the API does not support filtering, the resource
-                    # class should provide a filter method that will
-                    # return True if the returned data matches the
-                    # resource ID we are looking for.
-                    if not cls.filter(arn, resource_id, d):
-                        continue
-                resources.append(cls(client, d, arn.query))
-        return resources
+        return client.iter_call(enum_op, query=path, **kwargs)
 
     class Meta(object):
         type = 'resource'
@@ -115,7 +155,7 @@ class Resource(object):
     @property
     def name(self):
         if not self._name:
-            self._name = jmespath.search(self.Meta.name, self.data)
+            self._name = skew.query.search(self.Meta.name, self.data)
         return self._name
 
     @property
@@ -125,7 +165,7 @@ class Resource(object):
     @property
     def date(self):
         if not self._date:
-            self._date = jmespath.search(self.Meta.date, self.data)
+            self._date = skew.query.search(self.Meta.date, self.data)
         return self._date
 
     @property
@@ -0,0 +1,143 @@
+# Copyright 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import logging
+import threading
+from collections import namedtuple
+
+LOG = logging.getLogger(__name__)
+
+Added = 'added'
+Changed = 'changed'
+Removed = 'removed'
+
+# What an incremental scan yields.  ``resource`` is None for removals.
+ResourceChange = namedtuple('ResourceChange', ['kind', 'arn', 'resource'])
+
+
+def summary_hash(data):
+    """
+    A stable hash of the summary data returned for a resource by its
+    enumeration call.
+    """
+    encoded = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+class Snapshot(object):
+    """
+    A record of the resources found by a scan: the ARN of each resource
+    and a hash of its summary data, keyed by the service, resource type,
+    region, account and ID of the resource.
+
+    Pass a snapshot to ``scan`` as ``since`` and only the resources that
+    have been added, changed or removed since it was taken are returned.
+    The new snapshot is then available as the ``snapshot`` attribute of
+    the ARN.  An empty ``Snapshot()`` returns every resource as added.
+    """
+
+    def __init__(self, entries=None):
+        self.entries = entries if entries is not None else {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def arns(self):
+        return [e['arn'] for e in self.entries.values()]
+
+    def save(self, path):
+        with open(path, 'w') as fp:
+            json.dump({'version': 1, 'entries': self.entries}, fp)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as fp:
+            return cls(json.load(fp)['entries'])
+
+
+class SnapshotTracker(object):
+    """
+    Compares the resources seen during a scan with the ``since``
+    snapshot and builds up the new one.  The enumeration threads call
+    ``observe`` before a resource is constructed so resources whose
+    summary is unchanged are never constructed (or hydrated) at all.
+    """
+
+    def __init__(self, since):
+        self.since = since
+        self.snapshot = Snapshot()
+        self._scopes = set()
+        self._lock = threading.Lock()
+
+    def _scope(self, cls, region, account):
+        return '|'.join([cls.Meta.service, cls.Meta.type,
+                         region or '', account])
+
+    def _key(self, scope, cls, data):
+        if isinstance(data, dict):
+            id_field = getattr(cls.Meta, 'id', None)
+            resource_id = data.get(id_field) or summary_hash(data)
+        else:
+            resource_id = data
+        return '%s|%s' % (scope, resource_id)
+
+    def scanned(self, cls, region, account):
+        """
+        Record that all resources of ``cls`` in the region and account
+        are being enumerated, so any that aren't seen have been removed.
+        """
+        with self._lock:
+            self._scopes.add(self._scope(cls, region, account))
+
+    def observe(self, cls, region, account, data):
+        """
+        Returns None if the resource is unchanged, otherwise the state
+        that should be attached to the resource once it is constructed.
+        """
+        key = self._key(self._scope(cls, region, account), cls, data)
+        data_hash = summary_hash(data)
+        previous = self.since.entries.get(key)
+        if previous is not None and previous['hash'] == data_hash:
+            with self._lock:
+                self.snapshot.entries[key] = previous
+            return None
+        kind = Added if previous is None else Changed
+        return (key, data_hash, kind)
+
+    def record(self, resource):
+        """
+        Add a resource returned by the scan to the new snapshot and
+        return the ``ResourceChange`` for it.
+        """
+        key, data_hash, kind = resource._snapshot_state
+        arn = resource.arn
+        with self._lock:
+            self.snapshot.entries[key] = {'arn': arn, 'hash': data_hash}
+        return ResourceChange(kind, arn, resource)
+
+    def removed(self):
+        """
+        Yield a ``ResourceChange`` for every resource in ``since`` that
+        was within the scope of this scan but wasn't seen.
+        """
+        for key, entry in self.since.entries.items():
+            if key in self.snapshot.entries:
+                continue
+            if '|'.join(key.split('|', 4)[:4]) in self._scopes:
+                yield ResourceChange(Removed, entry['arn'], None)
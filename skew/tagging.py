@@ -0,0 +1,135 @@
+# Copyright 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Finds resources by tag with the Resource Groups Tagging API.
+
+One paginated ``GetResources`` call per region and account returns the
+ARN and tags of every resource matching the tag filters, so a scan
+with ``tags`` only needs to enumerate the resource types that have a
+match and only needs to describe the matching resources.
+"""
+
+import logging
+
+import skew.awsclient
+
+LOG = logging.getLogger(__name__)
+
+# The service names used in ARNs when they differ from the name of the
+# botocore client a resource class is enumerated with.
+ServiceAliases = {
+    'elb': 'elasticloadbalancing',
+}
+
+# Services whose ARNs contain only the resource ID, with no type.
+UntypedResources = {
+    's3': 'bucket',
+    'sns': 'topic',
+    'sqs': 'queue',
+}
+
+# Global resources are returned by the tagging API in us-east-1.
+GlobalRegion = 'us-east-1'
+
+# The most IDs passed to a single filtered describe call.
+MaxFilterIds = 100
+
+
+def tag_filters(tags):
+    """
+    Convert a ``tags`` dictionary into the ``TagFilters`` parameter of
+    ``GetResources``.  A value can be a string, a list of strings (any
+    of which may match) or None (the tag just has to be present).
+    """
+    filters = []
+    for key in sorted(tags):
+        value = tags[key]
+        tag_filter = {'Key': key}
+        if value is not None:
+            if not isinstance(value, (list, tuple)):
+                value = [value]
+            tag_filter['Values'] = list(value)
+        filters.append(tag_filter)
+    return filters
+
+
+def split_arn(arn):
+    """
+    Return the service, resource type and resource ID of ``arn``.  The
+    type is None for services whose ARNs don't include one.
+    """
+    parts = arn.split(':', 5)
+    service, resource = parts[2], parts[5]
+    if service in UntypedResources:
+        return service, UntypedResources[service], resource
+    for sep in ('/', ':'):
+        if sep in resource:
+            resource_type, resource_id = resource.split(sep, 1)
+            return service, resource_type, resource_id
+    return service, None, resource
+
+
+class TaggedResources(object):
+    """
+    The resources in one region of one account that matched the tag
+    filters, indexed by service and resource type.
+    """
+
+    def __init__(self, mappings):
+        self._index = {}
+        for mapping in mappings:
+            arn = mapping['ResourceARN']
+            service, resource_type, resource_id = split_arn(arn)
+            matches = self._index.setdefault((service, resource_type), {})
+            matches[resource_id] = (arn, mapping.get('Tags', []))
+
+    def __len__(self):
+        return sum(len(m) for m in self._index.values())
+
+    def arns(self):
+        arns = []
+        for matches in self._index.values():
+            arns.extend(arn for arn, _ in matches.values())
+        return arns
+
+    def for_class(self, resource_cls):
+        """
+        Return a dictionary mapping the ID of each matching resource of
+        ``resource_cls`` to a tuple of its ARN and its tags.
+        """
+        service = ServiceAliases.get(resource_cls.Meta.service,
+                                     resource_cls.Meta.service)
+        return self._index.get((service, resource_cls.Meta.type), {})
+
+
+def tagged_resources(arn, region, account, **kwargs):
+    """
+    Return the ``TaggedResources`` matching the ``tags`` of ``arn`` in
+    ``region`` and ``account``.  The lookup is only done once per scan
+    no matter how many resource types ask for it.
+    """
+    region = region or GlobalRegion
+
+    def lookup():
+        client = skew.awsclient.get_awsclient(
+            'resourcegroupstaggingapi', region, account, **kwargs)
+        mappings = list(client.iter_call(
+            'get_resources', query='ResourceTagMappingList',
+            TagFilters=tag_filters(arn.tags)))
+        LOG.debug('%d resources tagged %s in %s/%s',
+                  len(mappings), arn.tags, region, account)
+        return TaggedResources(mappings)
+
+    return arn.memo(('tagging', region, account), lookup)
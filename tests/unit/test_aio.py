@@ -0,0 +1,106 @@
+# Copyright (c) 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+# http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import asyncio
+import unittest
+import os
+
+import mock
+import placebo
+
+from skew import ascan
+from skew.snapshot import Snapshot
+
+
+class TestAsyncScan(unittest.TestCase):
+
+    def _get_response_path(self, test_case):
+        p = os.path.join(os.path.dirname(__file__), 'responses')
+        return os.path.join(p, test_case)
+
+    def setUp(self):
+        self.environ = {}
+        self.environ_patch = mock.patch('os.environ', self.environ)
+        self.environ_patch.start()
+        credential_path = os.path.join(os.path.dirname(__file__), 'cfg',
+                                       'aws_credentials')
+        self.environ['AWS_CONFIG_FILE'] = credential_path
+        config_path = os.path.join(os.path.dirname(__file__), 'cfg',
+                                   'skew.yml')
+        self.environ['SKEW_CONFIG'] = config_path
+
+    def tearDown(self):
+        self.environ_patch.stop()
+
+    def _collect(self, arn):
+        async def collect():
+            results = []
+            async for r in arn:
+                results.append(r)
+            return results
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(collect())
+        finally:
+            loop.close()
+
+    def test_ascan(self):
+        placebo_cfg = {
+            'placebo': placebo,
+            'placebo_dir': self._get_response_path('elbs'),
+            'placebo_mode': 'playback'}
+        arn = ascan('arn:aws:elb:us-east-1:123456789012:loadbalancer/*',
+                    max_concurrency=4, load_tags=True, **placebo_cfg)
+        l = self._collect(arn)
+        self.assertEqual(len(l), 1)
+        self.assertEqual(l[0].tags['Name'], 'example-web')
+
+    def test_ascan_hydrate(self):
+        placebo_cfg = {
+            'placebo': placebo,
+            'placebo_dir': self._get_response_path('elbs'),
+            'placebo_mode': 'playback'}
+        arn = ascan('arn:aws:elb:us-east-1:123456789012:loadbalancer/*',
+                    hydrate=True, max_queued=1, **placebo_cfg)
+        l = self._collect(arn)
+        self.assertEqual(len(l), 1)
+        # Everything was fetched before the resource was returned.
+        self.assertEqual(l[0]._hydration_names(), [])
+        self.assertIn('LoadBalancerAttributes', list(l[0].data))
+
+    def test_ascan_empty(self):
+        placebo_cfg = {
+            'placebo': placebo,
+            'placebo_dir': self._get_response_path('instances_3'),
+            'placebo_mode': 'playback'}
+        arn = ascan('arn:aws:ec2:us-west-2:123456789012:instance/i-87654321',
+                    **placebo_cfg)
+        self.assertEqual(self._collect(arn), [])
+
+    def test_ascan_since(self):
+        placebo_cfg = {
+            'placebo': placebo,
+            'placebo_dir': self._get_response_path('vpcs'),
+            'placebo_mode': 'playback'}
+        arn = ascan('arn:aws:ec2:us-west-2:123456789012:vpc/*',
+                    since=Snapshot(), **placebo_cfg)
+        changes = self._collect(arn)
+        self.assertEqual([c.kind for c in changes], ['added'] * 3)
+        entries = dict(arn.snapshot.entries)
+        entries['ec2|vpc|us-west-2|123456789012|vpc-gone'] = {
+            'arn': 'arn:gone', 'hash': 'x'}
+        arn = ascan('arn:aws:ec2:us-west-2:123456789012:vpc/*',
+                    since=Snapshot(entries), **placebo_cfg)
+        changes = self._collect(arn)
+        self.assertEqual([(c.kind, c.arn) for c in changes],
+                         [('removed', 'arn:gone')])
+        self.assertEqual(len(arn.snapshot), 3)
@@ -14,7 +14,7 @@ import unittest
 
 import mock
 
-from skew.arn import ARNComponent
+from skew.arn import ARNComponent, Matcher
 
 
 class FooBarComponent(ARNComponent):
@@ -47,3 +47,34 @@ class TestARNComponent(unittest.TestCase):
         self.assertEqual(foobar.pattern, 'f.*')
         self.assertEqual(foobar.matches(), ['foo', 'fie'])
         self.assertEqual(foobar.complete('b'), ['bar', 'baz'])
+
+    def test_matcher(self):
+        choices = ['ec2', 'ec2-instance-connect', 'elb', 'elbv2', 'iam']
+        self.assertEqual(Matcher('*').filter(choices), choices)
+        self.assertEqual(Matcher('').filter(choices), choices)
+        self.assertEqual(Matcher(None).kind, 'any')
+        # Literals only match themselves
+        self.assertEqual(Matcher('ec2').kind, 'literal')
+        self.assertEqual(Matcher('ec2').filter(choices), ['ec2'])
+        self.assertEqual(Matcher('ec').filter(choices), [])
+        # Globs and regular expressions match whole values
+        self.assertEqual(Matcher('elb*').kind, 'prefix')
+        self.assertEqual(Matcher('elb*').filter(choices), ['elb', 'elbv2'])
+        self.assertEqual(Matcher('*2').filter(choices), ['ec2', 'elbv2'])
+        self.assertEqual(Matcher('e.*2').kind, 'regex')
+        self.assertEqual(Matcher('e.*2').filter(choices), ['ec2', 'elbv2'])
+        self.assertEqual(Matcher('(iam|elb)').filter(choices),
+                         ['elb', 'iam'])
+        self.assertTrue(Matcher('us-*').match('us-east-1'))
+        self.assertFalse(Matcher('us-*').match('eu-west-1'))
+        # Anything but a single trailing * is a regular expression, as it
+        # always was, so this is a, any number of b's and c.
+        self.assertEqual(Matcher('ab*c').kind, 'regex')
+        self.assertEqual(Matcher('ab*c').filter(['ac', 'abbc', 'axc']),
+                         ['ac', 'abbc'])
+
+    def test_match_other_pattern(self):
+        foobar = FooBarComponent('*', None)
+        self.assertEqual(foobar.match('ba*'), ['bar', 'baz'])
+        self.assertEqual(foobar.match('fo'), [])
+        self.assertEqual(foobar.matches(), ['foo', 'bar', 'fie', 'baz'])
@@ -0,0 +1,74 @@
+# Copyright (c) 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+# http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import unittest
+import os
+
+import mock
+import placebo
+
+import skew.awsclient
+
+
+class TestClientPool(unittest.TestCase):
+
+    def setUp(self):
+        self.environ = {}
+        self.environ_patch = mock.patch('os.environ', self.environ)
+        self.environ_patch.start()
+        credential_path = os.path.join(os.path.dirname(__file__), 'cfg',
+                                       'aws_credentials')
+        self.environ['AWS_CONFIG_FILE'] = credential_path
+        config_path = os.path.join(os.path.dirname(__file__), 'cfg',
+                                   'skew.yml')
+        self.environ['SKEW_CONFIG'] = config_path
+
+    def tearDown(self):
+        self.environ_patch.stop()
+
+    def test_clients_are_shared(self):
+        pool = skew.awsclient.ClientPool()
+        with mock.patch('skew.awsclient._client_pool', pool):
+            c1 = skew.awsclient.get_awsclient(
+                'ec2', 'us-east-1', '123456789012')
+            c2 = skew.awsclient.get_awsclient(
+                'ec2', 'us-east-1', '123456789012')
+            c3 = skew.awsclient.get_awsclient(
+                'ec2', 'us-west-2', '123456789012')
+        self.assertIs(c1._client, c2._client)
+        self.assertIsNot(c1._client, c3._client)
+        stats = pool.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['clients'], 2)
+        self.assertEqual(stats['sessions'], 1)
+
+    def test_lru_eviction(self):
+        pool = skew.awsclient.ClientPool(max_clients=2)
+        with mock.patch('skew.awsclient._client_pool', pool):
+            for region in ('us-east-1', 'us-west-2', 'eu-west-1'):
+                skew.awsclient.get_awsclient('sqs', region, '123456789012')
+        stats = pool.stats()
+        self.assertEqual(stats['clients'], 2)
+        self.assertEqual(stats['evictions'], 1)
+
+    def test_iter_call(self):
+        placebo_dir = os.path.join(os.path.dirname(__file__), 'responses',
+                                   'volumes')
+        client = skew.awsclient.get_awsclient(
+            'ec2', 'us-west-2', '123456789012', placebo=placebo,
+            placebo_dir=placebo_dir, placebo_mode='playback')
+        volumes = client.iter_call('describe_volumes', query='Volumes')
+        self.assertFalse(isinstance(volumes, list))
+        volume_ids = [v['VolumeId'] for v in volumes]
+        self.assertEqual(len(volume_ids), 4)
+        self.assertEqual(volume_ids[0], 'vol-b85e475f')
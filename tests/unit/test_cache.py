@@ -0,0 +1,95 @@
+# Copyright (c) 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+# http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+import placebo
+from dateutil.tz import tzutc
+
+from skew import scan
+from skew.cache import ResponseCache
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.environ = {}
+        self.environ_patch = mock.patch('os.environ', self.environ)
+        self.environ_patch.start()
+        credential_path = os.path.join(os.path.dirname(__file__), 'cfg',
+                                       'aws_credentials')
+        self.environ['AWS_CONFIG_FILE'] = credential_path
+        config_path = os.path.join(os.path.dirname(__file__), 'cfg',
+                                   'skew.yml')
+        self.environ['SKEW_CONFIG'] = config_path
+
+    def tearDown(self):
+        self.environ_patch.stop()
+        shutil.rmtree(self.cache_dir)
+
+    def test_put_get(self):
+        cache = ResponseCache(self.cache_dir)
+        key = cache.key('123456789012', 'us-east-1', 'ec2',
+                        'describe_vpcs', {'VpcIds': ['vpc-1']})
+        self.assertEqual(key, cache.key('123456789012', 'us-east-1', 'ec2',
+                                        'describe_vpcs',
+                                        {'VpcIds': ['vpc-1']}))
+        self.assertEqual(cache.get(key), None)
+        now = datetime.datetime(2015, 1, 1, tzinfo=tzutc())
+        cache.put(key, 'describe_vpcs', {'Vpcs': [{'Created': now}]})
+        self.assertEqual(cache.get(key), {'Vpcs': [{'Created': now}]})
+
+    def test_ttl(self):
+        cache = ResponseCache(self.cache_dir, ttls={'describe_vpcs': -1})
+        key = cache.key('123456789012', 'us-east-1', 'ec2',
+                        'describe_vpcs', {})
+        cache.put(key, 'describe_vpcs', {'Vpcs': []})
+        self.assertEqual(cache.get(key), None)
+        # offline mode serves whatever is there, however old
+        cache.offline = True
+        self.assertEqual(cache.get(key), {'Vpcs': []})
+
+    def test_eviction(self):
+        cache = ResponseCache(self.cache_dir, max_size=1000)
+        keys = []
+        for i in range(20):
+            key = cache.key('123456789012', 'us-east-1', 'ec2',
+                            'describe_vpcs', {'i': i})
+            cache.put(key, 'describe_vpcs', {'Vpcs': ['x' * 50]})
+            keys.append(key)
+        self.assertEqual(cache.get(keys[0]), None)
+        self.assertNotEqual(cache.get(keys[-1]), None)
+        self.assertTrue(sum(e[1] for e in cache._entries()) <= 1000)
+
+    def test_offline_scan(self):
+        placebo_cfg = {
+            'placebo': placebo,
+            'placebo_dir': os.path.join(os.path.dirname(__file__),
+                                        'responses', 'vpcs'),
+            'placebo_mode': 'playback'}
+        cache = ResponseCache(self.cache_dir)
+        arn = scan('arn:aws:ec2:us-west-2:123456789012:vpc/*',
+                   cache=cache, **placebo_cfg)
+        self.assertEqual(len(list(arn)), 3)
+        offline = ResponseCache(self.cache_dir, offline=True)
+        arn = scan('arn:aws:ec2:us-west-2:123456789012:vpc/*',
+                   cache=offline)
+        self.assertEqual(len(list(arn)), 3)
+        arn = scan('arn:aws:ec2:us-west-2:123456789012:subnet/*',
+                   cache=offline)
+        self.assertEqual(len(list(arn)), 0)
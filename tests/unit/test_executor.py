@@ -0,0 +1,66 @@
+# Copyright (c) 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+# http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import threading
+import time
+import unittest
+
+from skew.arn import WorkUnit
+from skew.executor import ScanExecutor
+
+
+def make_unit(service, account, resource_type):
+    return WorkUnit('arn', 'aws', service, 'us-east-1', account,
+                    resource_type)
+
+
+class TestScanExecutor(unittest.TestCase):
+
+    def test_all_results_returned(self):
+        units = [make_unit('ec2', '123456789012', t)
+                 for t in ('instance', 'volume', 'vpc')]
+        executor = ScanExecutor(max_workers=3)
+        results = list(executor.run(units, lambda u: [u.resource_type] * 2))
+        self.assertEqual(sorted(results),
+                         ['instance', 'instance', 'volume', 'volume',
+                          'vpc', 'vpc'])
+
+    def test_service_limit(self):
+        lock = threading.Lock()
+        running = {'iam': 0}
+        peak = {'iam': 0}
+
+        def fn(unit):
+            with lock:
+                running[unit.service] = running.get(unit.service, 0) + 1
+                peak[unit.service] = max(peak.get(unit.service, 0),
+                                         running[unit.service])
+            time.sleep(0.01)
+            with lock:
+                running[unit.service] -= 1
+            return [unit]
+
+        units = [make_unit('iam', '123456789012', str(i)) for i in range(6)]
+        units += [make_unit('ec2', '123456789012', str(i)) for i in range(6)]
+        executor = ScanExecutor(max_workers=6, max_per_service={'iam': 1})
+        results = list(executor.run(units, fn))
+        self.assertEqual(len(results), 12)
+        self.assertEqual(peak['iam'], 1)
+        self.assertTrue(peak['ec2'] > 1)
+
+    def test_errors_are_raised(self):
+        def fn(unit):
+            raise ValueError(unit.resource_type)
+
+        executor = ScanExecutor(max_workers=2)
+        units = [make_unit('ec2', '123456789012', 'instance')]
+        self.assertRaises(ValueError, list, executor.run(units, fn))
@@ -0,0 +1,69 @@
+# Copyright (c) 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+# http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+# Modules that must not be imported until a scan needs them.
+HeavyModules = ['asyncio', 'boto3', 'botocore', 'concurrent.futures',
+                'jmespath', 'yaml', 'skew.awsclient', 'skew.resources.aws']
+
+# The most time, in seconds, ``import skew.arn`` may take in a fresh
+# interpreter.  It takes a small fraction of this on a laptop.  Slow CI
+# machines can raise it with SKEW_IMPORT_BUDGET, or set that to 0 to
+# skip the check.
+ImportBudget = float(os.environ.get('SKEW_IMPORT_BUDGET', 0.25))
+
+
+# Older versions have no module __getattr__ (or -X importtime) so skew
+# imports everything up front there.
+Lazy = sys.version_info >= (3, 7)
+
+
+class TestImports(unittest.TestCase):
+
+    def _run(self, *args):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        return subprocess.check_output(
+            [sys.executable] + list(args), cwd=root,
+            stderr=subprocess.STDOUT).decode('utf-8')
+
+    @unittest.skipUnless(Lazy, 'imports are only lazy on 3.7+')
+    def test_heavy_modules_not_imported(self):
+        output = self._run('-c', (
+            'import json, sys, skew, skew.arn\n'
+            'print(json.dumps(sorted(sys.modules)))'))
+        modules = json.loads(output.splitlines()[-1])
+        for name in HeavyModules:
+            self.assertNotIn(name, modules)
+
+    def test_lazy_names(self):
+        output = self._run('-c', (
+            'import skew\n'
+            'print(skew.ARN.__name__, skew.hydrate.__name__)'))
+        self.assertEqual(output.split(), ['ARN', 'hydrate'])
+
+    @unittest.skipUnless(Lazy, 'imports are only lazy on 3.7+')
+    @unittest.skipUnless(ImportBudget, 'SKEW_IMPORT_BUDGET is 0')
+    def test_import_budget(self):
+        output = self._run('-X', 'importtime', '-c', 'import skew.arn')
+        for line in output.splitlines():
+            parts = [p.strip() for p in line.split('|')]
+            if len(parts) == 3 and parts[2] == 'skew.arn':
+                self.assertLess(int(parts[1]) / 1e6, ImportBudget)
+                break
+        else:
+            self.fail('skew.arn was not imported')
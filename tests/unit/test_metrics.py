@@ -0,0 +1,311 @@
+# Copyright (c) 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+# http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import datetime
+import unittest
+
+import mock
+
+import skew.metrics
+from skew.resources.aws import MetricData
+from skew.resources.aws.ec2 import Instance
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Meta(object):
+    namespace = 'AWS/EC2'
+    dimension = 'InstanceId'
+
+
+class TestFetch(unittest.TestCase):
+
+    def _client(self, region):
+        # Emulates get_metric_data through AWSClient.iter_call, returning
+        # each query's datapoints over two pages like NextToken would.
+        client = mock.Mock(region_name=region, account_id='123456789012')
+
+        def iter_call(op_name, query=None, MetricDataQueries=None,
+                      StartTime=None, EndTime=None):
+            for page in (0, 1):
+                for q in MetricDataQueries:
+                    value = 1.0 if q['MetricStat']['Stat'] == 'Average' \
+                        else 2.0
+                    yield {'Id': q['Id'],
+                           'Timestamps': [StartTime + datetime.timedelta(
+                               minutes=page)],
+                           'Values': [value]}
+        client.iter_call.side_effect = iter_call
+        return client
+
+    def _resource(self, client, resource_id):
+        resource = mock.Mock(Meta=Meta, cloudwatch=client, id=resource_id)
+        resource.find_metric.side_effect = lambda name: {
+            'Namespace': Meta.namespace, 'MetricName': name,
+            'Dimensions': [{'Name': Meta.dimension, 'Value': resource_id}]}
+        return resource
+
+    def test_fetch(self):
+        west, east = self._client('us-west-2'), self._client('us-east-1')
+        resources = [self._resource(west, 'i-1'),
+                     self._resource(east, 'i-2'),
+                     self._resource(None, 'i-3'),
+                     self._resource(west, 'i-4')]
+        results = skew.metrics.fetch(resources, 'CPUUtilization',
+                                     statistics=['Average', 'Maximum'])
+        self.assertIsNone(results[2])
+        for data in (results[0], results[1], results[3]):
+            self.assertEqual(data.period, 60)
+            self.assertEqual(len(data.data), 2)
+            self.assertEqual(data.data[0]['Average'], 1.0)
+            self.assertEqual(data.data[0]['Maximum'], 2.0)
+            self.assertLess(data.data[0]['Timestamp'],
+                            data.data[1]['Timestamp'])
+        # One call per region
+        self.assertEqual(west.iter_call.call_count, 1)
+        self.assertEqual(east.iter_call.call_count, 1)
+        queries = west.iter_call.call_args[1]['MetricDataQueries']
+        self.assertEqual(len(queries), 4)
+        self.assertEqual(queries[0]['MetricStat']['Metric'], {
+            'Namespace': 'AWS/EC2', 'MetricName': 'CPUUtilization',
+            'Dimensions': [{'Name': 'InstanceId', 'Value': 'i-1'}]})
+
+    def test_fetch_batches(self):
+        client = self._client('us-west-2')
+        resources = [self._resource(client, 'i-%d' % i) for i in range(501)]
+        results = skew.metrics.fetch(resources, 'CPUUtilization')
+        self.assertEqual(len(results), 501)
+        self.assertEqual(client.iter_call.call_count, 2)
+        # 14 days of one minute datapoints forces smaller batches.
+        client.iter_call.reset_mock()
+        skew.metrics.fetch(resources[:10], 'CPUUtilization',
+                           days=14, period=60)
+        self.assertEqual(client.iter_call.call_count, 2)
+        # Beyond the datapoint limit of one call the time frame is split.
+        client.iter_call.reset_mock()
+        skew.metrics.fetch(resources[:3], 'CPUUtilization',
+                           days=100, period=60)
+        self.assertEqual(client.iter_call.call_count, 6)
+
+    def test_split_window(self):
+        start = datetime.datetime(2020, 1, 1)
+        end = start + datetime.timedelta(minutes=250)
+        windows = skew.metrics.split_window(start, end, 60, 100)
+        self.assertEqual(len(windows), 3)
+        self.assertEqual(windows[0][1], windows[1][0])
+        self.assertEqual(windows[-1][1], end)
+
+    def test_fetch_without_namespace(self):
+        client = self._client('us-west-2')
+        resource = self._resource(client, 'foo')
+        resource.Meta = object
+        resource.find_metric.side_effect = lambda name: None
+        self.assertEqual(skew.metrics.fetch([resource], 'Foo'), [None])
+        self.assertFalse(client.iter_call.called)
+
+
+class TestMetricIndex(unittest.TestCase):
+
+    Metrics = [
+        {'Namespace': 'AWS/EC2', 'MetricName': 'CPUUtilization',
+         'Dimensions': [{'Name': 'InstanceId', 'Value': 'i-1'}]},
+        {'Namespace': 'AWS/EC2', 'MetricName': 'NetworkIn',
+         'Dimensions': [{'Name': 'InstanceId', 'Value': 'i-1'}]},
+        {'Namespace': 'AWS/EC2', 'MetricName': 'CPUUtilization',
+         'Dimensions': [{'Name': 'InstanceId', 'Value': 'i-2'}]},
+        {'Namespace': 'AWS/EC2', 'MetricName': 'CPUUtilization',
+         'Dimensions': [{'Name': 'ImageId', 'Value': 'ami-1'}]},
+        {'Namespace': 'AWS/EC2', 'MetricName': 'EBSReadOps',
+         'Dimensions': [{'Name': 'InstanceId', 'Value': 'i-2'},
+                        {'Name': 'VolumeId', 'Value': 'vol-1'}]},
+    ]
+
+    def setUp(self):
+        skew.metrics.clear()
+        self.cloudwatch = mock.Mock()
+        self.cloudwatch.iter_call.side_effect = \
+            lambda *args, **kwargs: iter(self.Metrics)
+        patcher = mock.patch('skew.awsclient.get_awsclient',
+                             return_value=self.cloudwatch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(skew.metrics.clear)
+
+    def test_index(self):
+        index = skew.metrics.MetricIndex(self.Metrics)
+        self.assertEqual(len(index.metrics('InstanceId', 'i-1')), 2)
+        self.assertEqual(index.metrics('InstanceId', 'i-3'), [])
+        self.assertEqual(index.find('ImageId', 'ami-1', 'CPUUtilization'),
+                         self.Metrics[3])
+        self.assertIsNone(index.find('InstanceId', 'i-2', 'NetworkIn'))
+
+    def test_resources_share_index(self):
+        client = mock.Mock(region_name='us-west-2',
+                           account_id='123456789012')
+        instances = [Instance(client, {'InstanceId': 'i-%d' % i})
+                     for i in (1, 2, 3)]
+        self.assertEqual(instances[0].metric_names,
+                         ['CPUUtilization', 'NetworkIn'])
+        self.assertEqual(instances[1].find_metric('CPUUtilization'),
+                         self.Metrics[2])
+        self.assertEqual(instances[2].metrics, [])
+        self.assertEqual(self.cloudwatch.iter_call.call_count, 1)
+        self.cloudwatch.iter_call.assert_called_with(
+            'list_metrics', query='Metrics', Namespace='AWS/EC2')
+        self.assertFalse(self.cloudwatch.call.called)
+        # The index is rebuilt once it expires
+        with mock.patch('time.time', return_value=2e10):
+            instances[1].metrics
+        self.assertEqual(self.cloudwatch.iter_call.call_count, 2)
+
+
+    def test_metric_query(self):
+        client = mock.Mock(region_name='us-west-2',
+                           account_id='123456789012')
+        instance = Instance(client, {'InstanceId': 'i-2'})
+        # Metrics keep all of their dimensions, not just the resource's.
+        self.assertEqual(
+            skew.metrics.metric_query(instance, 'EBSReadOps'),
+            ('AWS/EC2', self.Metrics[4]['Dimensions']))
+        self.assertIsNone(skew.metrics.metric_query(instance, 'NetworkIn'))
+        self.assertEqual(self.cloudwatch.iter_call.call_count, 1)
+
+
+class TestMetricData(unittest.TestCase):
+
+    def _datapoints(self, values, statistic='Average', minutes=1):
+        start = datetime.datetime(2020, 1, 1)
+        return [{'Timestamp': start + datetime.timedelta(minutes=minutes * i),
+                 statistic: value, 'Unit': 'Percent'}
+                for i, value in enumerate(values)]
+
+    def test_sorted(self):
+        datapoints = self._datapoints([1.0, 2.0, 3.0])
+        data = MetricData(list(reversed(datapoints)), 60)
+        self.assertEqual(data.data, datapoints)
+        self.assertEqual(data.statistics, ['Average'])
+
+    def test_from_columns(self):
+        data = MetricData.from_columns(
+            [0, 60], {'Sum': [1.0, float('nan')], 'Maximum': [2.0, 3.0]}, 60)
+        self.assertEqual(sorted(data.statistics), ['Maximum', 'Sum'])
+        self.assertEqual(data.data[0]['Sum'], 1.0)
+        self.assertNotIn('Sum', data.data[1])
+        self.assertEqual(data.data[1]['Timestamp'].year, 1970)
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_arrays(self):
+        data = MetricData(self._datapoints([1.0, 2.0, 3.0, 4.0]), 60)
+        self.assertEqual(data.timestamps[1] - data.timestamps[0], 60)
+        self.assertEqual(list(data.values()), [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(data.percentile(50), 2.5)
+        resampled = data.resample(120)
+        self.assertEqual(resampled.period, 120)
+        self.assertEqual(list(resampled.values()), [1.5, 3.5])
+        self.assertEqual(list(data.resample(120, how='max').values()),
+                         [2.0, 4.0])
+        self.assertRaises(ValueError, data.resample, 120, how='median')
+        sums = MetricData(self._datapoints([60.0, 120.0], 'Sum'), 60)
+        self.assertEqual(list(sums.rate()), [1.0, 2.0])
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_aggregate(self):
+        fleet = [MetricData(self._datapoints([1.0, 2.0]), 60),
+                 MetricData(self._datapoints([3.0, 4.0, 5.0]), 60),
+                 None]
+        p50 = skew.metrics.aggregate(fleet, q=50)
+        self.assertEqual(p50.statistics, ['p50'])
+        self.assertEqual(list(p50.values('p50')), [2.0, 3.0, 5.0])
+        maximum = skew.metrics.aggregate(fleet, how='max')
+        self.assertEqual(list(maximum.values('max')), [3.0, 4.0, 5.0])
+        self.assertEqual(maximum.data[2]['max'], 5.0)
+
+
+class TestDatapointCache(unittest.TestCase):
+
+    Metric = {'Namespace': 'AWS/EC2', 'MetricName': 'CPUUtilization',
+              'Dimensions': [{'Name': 'InstanceId', 'Value': 'i-1'}]}
+
+    def setUp(self):
+        # Emulates get_metric_statistics with a datapoint every minute.
+        self.client = mock.Mock(region_name='us-west-2',
+                                account_id='123456789012')
+
+        def call(op_name, query=None, StartTime=None, EndTime=None,
+                 Period=None, Statistics=None, **kwargs):
+            datapoints = []
+            t = StartTime
+            while t < EndTime:
+                datapoint = {'Timestamp': t, 'Unit': 'Percent'}
+                for statistic in Statistics:
+                    datapoint[statistic] = float(t.minute)
+                datapoints.append(datapoint)
+                t += datetime.timedelta(seconds=Period)
+            return datapoints
+        self.client.call.side_effect = call
+        self.start = datetime.datetime(2020, 1, 1)
+        self.now = skew.resources.aws.epoch_seconds(self.start)
+
+    def _get(self, cache, minutes, length=60):
+        start = self.start + datetime.timedelta(minutes=minutes)
+        end = start + datetime.timedelta(minutes=length)
+        with mock.patch('time.time', return_value=self.now):
+            return cache.get_metric_data(
+                self.client, self.Metric, ['Average', 'Maximum'],
+                start, end, 60)
+
+    def _fetched(self):
+        # The number of minutes requested by each call.
+        return [(c[1]['EndTime'] - c[1]['StartTime']).seconds // 60
+                for c in self.client.call.call_args_list]
+
+    def test_sliding_window(self):
+        cache = skew.metrics.DatapointCache(settle=0)
+        self.now += 2 * 60 * 60
+        data = self._get(cache, 0)
+        self.assertEqual(len(data.data), 60)
+        self.assertEqual(data.data[5]['Maximum'], 5.0)
+        self.assertEqual(data.data[5]['Unit'], 'Percent')
+        self.assertEqual(self._get(cache, 0).data, data.data)
+        data = self._get(cache, 10)
+        self.assertEqual(len(data.data), 60)
+        self.assertEqual(data.data[-1]['Average'], 9.0)
+        data = self._get(cache, -5, 70)
+        self.assertEqual(len(data.data), 70)
+        self.assertEqual(self._fetched(), [60, 10, 5])
+
+    def test_unsettled_buckets_refetched(self):
+        cache = skew.metrics.DatapointCache(settle=5 * 60)
+        self.now += 60 * 60
+        self._get(cache, 0)
+        self._get(cache, 0)
+        self.assertEqual(self._fetched(), [60, 5])
+
+    def test_eviction(self):
+        cache = skew.metrics.DatapointCache(max_points=150, settle=0)
+        self.now += 2 * 60 * 60
+        self._get(cache, 0)
+        self.assertEqual(len(cache), 120)
+        other = dict(self.Metric, MetricName='NetworkIn')
+        with mock.patch('time.time', return_value=self.now):
+            cache.get_metric_data(self.client, other, ['Average'],
+                                  self.start, self.start +
+                                  datetime.timedelta(minutes=60), 60)
+        # The least recently used series (CPUUtilization Average) is gone
+        self.assertEqual(len(cache), 120)
+        # and NetworkIn is too old once we come back to CPUUtilization.
+        self.now += 2 * 60 * 60
+        self._get(cache, 0, 1)
+        self.assertEqual(len(cache), 61)
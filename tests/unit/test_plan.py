@@ -0,0 +1,109 @@
+# Copyright (c) 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+# http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+import placebo
+
+from skew import scan
+from skew.plan import ScanPlan
+
+
+class TestScanPlan(unittest.TestCase):
+
+    def setUp(self):
+        self.environ = {}
+        self.environ_patch = mock.patch('os.environ', self.environ)
+        self.environ_patch.start()
+        self.addCleanup(self.environ_patch.stop)
+        credential_path = os.path.join(os.path.dirname(__file__), 'cfg',
+                                       'aws_credentials')
+        self.environ['AWS_CONFIG_FILE'] = credential_path
+        config_path = os.path.join(os.path.dirname(__file__), 'cfg',
+                                   'skew.yml')
+        self.environ['SKEW_CONFIG'] = config_path
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+
+    def test_plan(self):
+        plan = scan('arn:aws:elb:us-east-1:*:loadbalancer/*').plan()
+        self.assertEqual(len(plan), 4)
+        step = plan.steps[0]
+        self.assertEqual(step.unit.service, 'elb')
+        self.assertEqual(step.operation, 'describe_load_balancers')
+        self.assertEqual(step.detail_calls, 2)
+        self.assertEqual(step.tag_calls, 1.0 / 20)
+        self.assertEqual(plan.calls(), 4)
+        self.assertEqual(plan.calls(40, details=True), 4 * 81)
+        self.assertEqual(plan.calls(40, tags=True), 4 * 3)
+        self.assertEqual(plan.calls(by='account')['123456789012'], 1)
+
+    def _step(self, arn):
+        plan = scan(arn).plan()
+        self.assertEqual(len(plan), 1)
+        step = plan.steps[0]
+        return (step.operation, step.unit_calls, step.scan_calls,
+                step.detail_calls)
+
+    def test_resource_calls(self):
+        # Buckets are located as they are listed and have nothing to
+        # hydrate.
+        self.assertEqual(
+            self._step('arn:aws:s3:us-east-1:123456789012:bucket/*'),
+            ('list_buckets', 1, 1, 0))
+        # The resources of a stack are listed once.
+        self.assertEqual(
+            self._step('arn:aws:cloudformation:us-east-1:123456789012:'
+                       'stack/*'),
+            ('describe_stacks', 1, 0, 1))
+        # get_user, five attr_spec calls and the inline policies.
+        self.assertEqual(
+            self._step('arn:aws:iam::123456789012:user/*'),
+            ('list_users', 1, 0, 7))
+        # Event sources are listed once for the region.
+        self.assertEqual(
+            self._step('arn:aws:lambda:us-east-1:123456789012:function/*'),
+            ('list_functions', 2, 0, 0))
+        plan = scan('arn:aws:s3:us-east-1:123456789012:bucket/*').plan()
+        self.assertEqual(plan.calls(10), 11)
+
+    def test_max_units(self):
+        arn = scan('arn:aws:ec2:*:*:*/*', enabled_regions_only=False)
+        self.assertRaises(ValueError, arn.plan, max_units=10)
+
+    def test_shard_save_and_load(self):
+        plan = scan('arn:aws:ec2:us-west-2:*:*/*').plan()
+        shards = plan.shard(3)
+        self.assertEqual(sum(len(s) for s in shards), len(plan))
+        path = os.path.join(self.tmpdir, 'plan.json')
+        shards[1].save(path)
+        loaded = ScanPlan.load(path)
+        self.assertEqual(loaded.arn, plan.arn)
+        self.assertEqual(loaded.steps, shards[1].steps)
+
+    def test_run(self):
+        placebo_cfg = {
+            'placebo': placebo,
+            'placebo_dir': os.path.join(os.path.dirname(__file__),
+                                        'responses', 'elbs'),
+            'placebo_mode': 'playback'}
+        plan = scan('arn:aws:elb:us-east-1:123456789012:*/*').plan()
+        resources = list(plan.run(**placebo_cfg))
+        self.assertEqual(len(resources), 1)
+        self.assertEqual(resources[0].arn, 'arn:aws:elb:us-east-1:'
+                         '123456789012:loadbalancer/example')
+        resources = list(plan.run(max_workers=2, **placebo_cfg))
+        self.assertEqual(len(resources), 1)
@@ -0,0 +1,35 @@
+# Copyright (c) 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+# http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import unittest
+
+import skew.query
+import skew.resources
+
+
+class TestQuery(unittest.TestCase):
+
+    def test_compiled_once(self):
+        q1 = skew.query.compile_query('Reservations[].Instances[]')
+        q2 = skew.query.compile_query('Reservations[].Instances[]')
+        self.assertIs(q1, q2)
+
+    def test_search(self):
+        data = {'Foo': {'Bar': 42}}
+        self.assertEqual(skew.query.search('Foo.Bar', data), 42)
+        self.assertEqual(skew.query.search(None, data), None)
+
+    def test_precompile(self):
+        cls = skew.resources.find_resource_class('aws.elb.loadbalancer')
+        self.assertIn(cls, skew.query._precompiled)
+        self.assertIn('TagDescriptions[].Tags[]', skew.query._cache)
+        self.assertIn('PolicyDescriptions', skew.query._cache)
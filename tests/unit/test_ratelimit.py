@@ -0,0 +1,104 @@
+# Copyright (c) 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+# http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import unittest
+
+import botocore.session
+import mock
+from botocore.awsrequest import AWSResponse
+from botocore.exceptions import ClientError
+
+from skew.ratelimit import RateController, TokenBucket, is_throttle
+
+THROTTLED = (None, {'Error': {'Code': 'Throttling'}})
+OK = (None, {'ResponseMetadata': {}})
+
+THROTTLED_BODY = (b'<Response><Errors><Error><Code>RequestLimitExceeded'
+                  b'</Code><Message>Request limit exceeded.</Message>'
+                  b'</Error></Errors><RequestID>1</RequestID></Response>')
+
+
+class FakeRaw(object):
+
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, **kwargs):
+        yield self.body
+
+
+class TestRateController(unittest.TestCase):
+
+    def test_is_throttle(self):
+        self.assertTrue(is_throttle(THROTTLED))
+        self.assertFalse(is_throttle(OK))
+        self.assertFalse(is_throttle(None))
+
+    def test_aimd(self):
+        controller = RateController()
+        rate = controller.rate
+        delay = controller.needs_retry(response=THROTTLED, attempts=1)
+        self.assertTrue(0 <= delay <= controller.max_delay)
+        self.assertEqual(controller.rate, rate * controller.decrease)
+        self.assertEqual(controller.needs_retry(response=OK, attempts=1),
+                         None)
+        self.assertEqual(controller.rate,
+                         rate * controller.decrease + controller.increase)
+        stats = controller.stats()
+        self.assertEqual(stats['throttles'], 1)
+        self.assertEqual(stats['retries'], 1)
+
+    def test_retry_limits(self):
+        controller = RateController()
+        self.assertFalse(controller.needs_retry(
+            response=THROTTLED, attempts=controller.max_attempts))
+        controller._budget = 0
+        self.assertFalse(controller.needs_retry(
+            response=THROTTLED, attempts=1))
+        self.assertEqual(controller.stats()['giveups'], 2)
+
+    def test_backoff_is_capped(self):
+        controller = RateController()
+        for attempts in range(1, 30):
+            self.assertTrue(controller.backoff(attempts) <=
+                            controller.max_delay)
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=50.0, capacity=2)
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertTrue(bucket.acquire() > 0.0)
+
+    def test_attached_to_client(self):
+        session = botocore.session.get_session()
+        client = session.create_client(
+            'ec2', 'us-east-1', aws_access_key_id='foo',
+            aws_secret_access_key='bar')
+        controller = RateController()
+        controller.max_attempts = 3
+        controller.attach(client)
+        attempts = []
+
+        def send(request, **kwargs):
+            attempts.append(request)
+            return AWSResponse(request.url, 503, {},
+                               FakeRaw(THROTTLED_BODY))
+
+        client.meta.events.register('before-send', send)
+        with mock.patch('time.sleep') as sleep:
+            self.assertRaises(ClientError, client.describe_regions)
+        # The controller alone decides how throttled calls are retried.
+        self.assertEqual(len(attempts), controller.max_attempts)
+        delays = [c[0][0] for c in sleep.call_args_list]
+        self.assertEqual(len(delays), controller.max_attempts - 1)
+        self.assertAlmostEqual(sum(delays), controller.wait_time)
+        self.assertEqual(controller.stats()['giveups'], 1)
@@ -62,3 +62,23 @@ class TestResource(unittest.TestCase):
     def test_all_services(self):
         all_providers = skew.resources.all_services('aws')
         self.assertEqual(len(all_providers), 24)
+
+    def test_register_resource(self):
+        with mock.patch.dict(skew.resources._registered), \
+                mock.patch.dict(skew.resources._classes), \
+                mock.patch.object(skew.resources, '_index',
+                                  skew.resources._index):
+            self.assertNotIn('foo', skew.resources.all_types('aws', 'ec2'))
+            skew.resources.register_resource('aws.ec2.foo', FooResource)
+            skew.resources.register_resource(
+                'aws.widgets.foo', 'tests.unit.test_resource.FooResource')
+            self.assertIn('foo', skew.resources.all_types('aws', 'ec2'))
+            self.assertEqual(len(skew.resources.all_services('aws')), 25)
+            self.assertIs(skew.resources.find_resource_class('aws.ec2.foo'),
+                          FooResource)
+            self.assertIs(
+                skew.resources.find_resource_class('aws.widgets.foo'),
+                FooResource)
+            self.assertRaises(ValueError, skew.resources.register_resource,
+                              'ec2.foo', FooResource)
+        self.assertNotIn('foo', skew.resources.all_types('aws', 'ec2'))
@@ -0,0 +1,102 @@
+# Copyright (c) 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+# http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import unittest
+
+import mock
+
+from skew.resources.aws.s3 import Bucket, LocationCache
+
+
+class TestBucketLocations(unittest.TestCase):
+
+    def setUp(self):
+        Bucket._location_cache.clear()
+
+    def test_location_cache_expires(self):
+        cache = LocationCache(ttl=60)
+        cache.put('foo', 'us-west-2')
+        self.assertEqual(cache.get('foo'), 'us-west-2')
+        with mock.patch('time.time', return_value=2e10):
+            self.assertIsNone(cache.get('foo'))
+        self.assertIsNone(cache.get('foo'))
+
+    def test_located_buckets(self):
+        constraints = {'a': None, 'b': 'EU', 'c': 'us-west-2'}
+        client = mock.Mock()
+        client.iter_call.return_value = iter(
+            [{'Name': name} for name in sorted(constraints)])
+        client.call.side_effect = lambda op_name, Bucket: {
+            'LocationConstraint': constraints[Bucket]}
+        buckets = Bucket._located_buckets(client)
+        self.assertEqual([loc for _, loc in buckets],
+                         ['us-east-1', 'eu-west-1', 'us-west-2'])
+        self.assertEqual(client.call.call_count, 3)
+        # Locations are remembered
+        client.iter_call.return_value = iter([{'Name': 'c'}])
+        self.assertEqual(Bucket._located_buckets(client),
+                         [({'Name': 'c'}, 'us-west-2')])
+        self.assertEqual(client.call.call_count, 3)
+
+
+class TestBucketObjects(unittest.TestCase):
+
+    Keys = ['top', 'a/1', 'a/2', 'a/b/3', 'b/4', 'c/5', 'c/6']
+
+    def _client(self):
+        # Emulates list_objects_v2 through AWSClient.iter_call.
+        def iter_call(op_name, query=None, Bucket=None, Prefix='',
+                      Delimiter=None):
+            keys = [k for k in self.Keys if k.startswith(Prefix)]
+            if Delimiter is None:
+                return iter([{'Key': k} for k in keys])
+            contents = []
+            prefixes = []
+            for k in keys:
+                rest = k[len(Prefix):]
+                if Delimiter in rest:
+                    p = Prefix + rest.split(Delimiter)[0] + Delimiter
+                    if p not in prefixes:
+                        prefixes.append(p)
+                else:
+                    contents.append({'Key': k})
+            return iter([{'Contents': contents,
+                          'CommonPrefixes': [{'Prefix': p}
+                                             for p in prefixes]}])
+
+        client = mock.Mock()
+        client.iter_call.side_effect = iter_call
+        return client
+
+    def test_iter(self):
+        client = self._client()
+        bucket = Bucket(client, {'Name': 'foo'})
+        self.assertEqual([o['Key'] for o in bucket], self.Keys)
+        op_name = client.iter_call.call_args[0][0]
+        self.assertEqual(op_name, 'list_objects_v2')
+        self.assertEqual([o['Key'] for o in bucket.iter_objects('a/')],
+                         ['a/1', 'a/2', 'a/b/3'])
+
+    def test_iter_parallel(self):
+        bucket = Bucket(self._client(), {'Name': 'foo'})
+        keys = [o['Key'] for o in bucket.iter_objects(
+            parallel=True, max_workers=2, max_buffered=1)]
+        self.assertEqual(sorted(keys), sorted(self.Keys))
+        keys = [o['Key'] for o in bucket.iter_objects(
+            prefix='a/', parallel=True)]
+        self.assertEqual(sorted(keys), ['a/1', 'a/2', 'a/b/3'])
+
+    def test_iter_parallel_stops_early(self):
+        bucket = Bucket(self._client(), {'Name': 'foo'})
+        objects = bucket.iter_objects(parallel=True, max_buffered=1)
+        self.assertIsNotNone(next(objects))
+        objects.close()
@@ -0,0 +1,94 @@
+# Copyright (c) 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+# http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+import placebo
+
+from skew import scan
+from skew.snapshot import Snapshot
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.environ = {}
+        self.environ_patch = mock.patch('os.environ', self.environ)
+        self.environ_patch.start()
+        credential_path = os.path.join(os.path.dirname(__file__), 'cfg',
+                                       'aws_credentials')
+        self.environ['AWS_CONFIG_FILE'] = credential_path
+        config_path = os.path.join(os.path.dirname(__file__), 'cfg',
+                                   'skew.yml')
+        self.environ['SKEW_CONFIG'] = config_path
+        self.placebo_cfg = {
+            'placebo': placebo,
+            'placebo_dir': os.path.join(os.path.dirname(__file__),
+                                        'responses', 'vpcs'),
+            'placebo_mode': 'playback'}
+
+    def tearDown(self):
+        self.environ_patch.stop()
+
+    def _scan(self, since, resource_id='*'):
+        arn = scan('arn:aws:ec2:us-west-2:123456789012:vpc/%s' % resource_id,
+                   since=since, **self.placebo_cfg)
+        return arn, list(arn)
+
+    def test_incremental_scan(self):
+        arn, changes = self._scan(Snapshot())
+        self.assertEqual([c.kind for c in changes], ['added'] * 3)
+        snapshot = arn.snapshot
+        self.assertEqual(len(snapshot), 3)
+        self.assertEqual(sorted(snapshot.arns()), sorted(c.arn for c in changes))
+
+        arn, changes = self._scan(snapshot)
+        self.assertEqual(changes, [])
+        self.assertEqual(len(arn.snapshot), 3)
+
+        keys = sorted(snapshot.entries)
+        entries = dict(snapshot.entries)
+        del entries[keys[0]]
+        entries[keys[1]] = {'arn': entries[keys[1]]['arn'], 'hash': 'x'}
+        entries[keys[2][:-1] + 'gone'] = {'arn': 'arn:gone', 'hash': 'x'}
+        entries['ec2|vpc|us-east-1|123456789012|vpc-1'] = {
+            'arn': 'arn:other-region', 'hash': 'x'}
+        arn, changes = self._scan(Snapshot(entries))
+        kinds = sorted((c.kind, c.arn) for c in changes)
+        self.assertEqual([k for k, _ in kinds],
+                         ['added', 'changed', 'removed'])
+        self.assertEqual(kinds[2][1], 'arn:gone')
+        self.assertEqual(len(arn.snapshot), 3)
+
+    def test_filtered_scan(self):
+        arn, _ = self._scan(Snapshot())
+        entries = dict(arn.snapshot.entries)
+        entries['ec2|vpc|us-west-2|123456789012|vpc-gone'] = {
+            'arn': 'arn:gone', 'hash': 'x'}
+        # Scanning one VPC says nothing about the others.
+        arn, changes = self._scan(Snapshot(entries), 'vpc-7f5e861a')
+        self.assertEqual([c for c in changes if c.kind == 'removed'], [])
+
+    def test_save_load(self):
+        arn, _ = self._scan(Snapshot())
+        path = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(path, 'snapshot.json')
+            arn.snapshot.save(file_path)
+            loaded = Snapshot.load(file_path)
+            self.assertEqual(loaded.entries, arn.snapshot.entries)
+        finally:
+            shutil.rmtree(path)
@@ -0,0 +1,70 @@
+# Copyright (c) 2015 Mitch Garnaat
+#
+# Licensed under the Apache License, Version 2.0 (the "License"). You
+# may not use this file except in compliance with the License. A copy of
+# the License is located at
+#
+# http://aws.amazon.com/apache2.0/
+#
+# or in the "license" file accompanying this file. This file is
+# distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF
+# ANY KIND, either express or implied. See the License for the specific
+# language governing permissions and limitations under the License.
+import unittest
+
+import mock
+
+from skew.resources.aws import load_tags, tag_batches, tags_to_dict
+from skew.resources.aws.cloudtrail import CloudTrail
+from skew.resources.aws.ec2 import Instance
+
+
+def trail_arn(i):
+    return 'arn:aws:cloudtrail:us-east-1:123456789012:trail/t%d' % i
+
+
+class TestTags(unittest.TestCase):
+
+    def _client(self):
+        client = mock.Mock()
+        client.region_name = 'us-east-1'
+        client.account_id = '123456789012'
+
+        def call(op_name, query=None, **kwargs):
+            return [{'ResourceId': arn,
+                     'TagsList': [{'Key': 'Name', 'Value': arn[-3:]}]}
+                    for arn in kwargs['ResourceIdList']]
+
+        client.call.side_effect = call
+        return client
+
+    def test_tags_to_dict(self):
+        tags = [{'Key': 'a', 'Value': '1'}, {'Key': 'b', 'Value': '2'},
+                {'Key': 'a', 'Value': '3'}]
+        self.assertEqual(tags_to_dict(tags), {'a': ['1', '3'], 'b': '2'})
+        self.assertEqual(tags_to_dict({'a': '1'}), {'a': '1'})
+        self.assertEqual(tags_to_dict(None), {})
+
+    def test_batched(self):
+        client = self._client()
+        trails = [CloudTrail(client, {'Name': 't%d' % i,
+                                      'TrailARN': trail_arn(i)})
+                  for i in range(45)]
+        load_tags(trails)
+        self.assertEqual(client.call.call_count, 3)
+        sizes = [len(c[1]['ResourceIdList'])
+                 for c in client.call.call_args_list]
+        self.assertEqual(sizes, [20, 20, 5])
+        self.assertEqual(trails[44].tags, {'Name': 't44'})
+        # Nothing left to load
+        self.assertEqual(list(tag_batches(trails)), [])
+        load_tags(trails)
+        self.assertEqual(client.call.call_count, 3)
+
+    def test_inline_tags(self):
+        client = self._client()
+        instance = Instance(client, {'InstanceId': 'i-1',
+                                     'Tags': [{'Key': 'a', 'Value': '1'}]})
+        load_tags([instance])
+        self.assertEqual(client.call.call_count, 0)
+        self.assertEqual(instance.tags, {'a': '1'})